@@ -0,0 +1,345 @@
+"""Benchmark report generation on synthetic reports
+
+Generates settings, subjects and pictures at several scales, renders
+them and records, per scenario, the time spent in each phase, the peak
+memory and the size of the output:
+
+    python benchmarks/bench_report.py --output results.json
+    python benchmarks/bench_report.py --baseline results.json
+
+With --baseline, any phase, memory or size worse than the baseline by
+more than --tolerance fails the run with exit code 1; phases must also
+be slower by more than --min-delta seconds, so noise on short phases
+doesn't.
+"""
+import sys
+import os
+import os.path as path
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import tracemalloc
+from datetime import datetime as dt
+import yaml
+
+_path = path.join(
+    path.dirname(path.dirname(path.abspath(__file__))), "template"
+)
+if _path not in sys.path:
+    sys.path.append(_path)
+
+import ut_simple  # noqa E402
+from units import _profile  # noqa E402
+
+# name -> (subjects, max pictures per subject, picture kind)
+SCENARIOS = {
+    "1-subject": (1, 5, "small"),
+    "10-subjects": (10, 20, "small"),
+    "100-subjects": (100, 50, "small"),
+    "10-subjects-4k": (10, 5, "4k"),
+    # narrow pictures, tiled under a caption far wider with --pack
+    "10-subjects-tall": (10, 20, "tall"),
+}
+# picture kind -> (width, height, format)
+PICTURES = {
+    "small": (800, 600, "png"),
+    "4k": (3840, 2160, "jpeg"),
+    "tall": (200, 1000, "png"),
+}
+PHASES = ["yaml", "probe", "layout", "shapes", "save"]
+# slow downs of a phase below this many seconds are taken as noise
+MIN_DELTA = 0.05
+SEED = 20180501
+
+_WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do "
+    "eiusmod tempor incididunt ut labore et dolore magna aliqua"
+).split()
+
+
+def _make_picture(file, kind, index):
+    from PIL import Image, ImageDraw
+
+    width, height, fmt = PICTURES[kind]
+    rng = random.Random(index)
+    img = Image.new("RGB", (width, height), (255, 255, 255))
+    if fmt == "jpeg":
+        # photo-like noise, so the file is as large as a real photo
+        noise = Image.effect_noise((width, height), 64).convert("RGB")
+        img = Image.blend(img, noise, 0.5)
+
+    # a unique drawing per picture, so no two pictures are identical
+    draw = ImageDraw.Draw(img)
+    for _ in range(12):
+        x, y = rng.randrange(width), rng.randrange(height)
+        w, h = rng.randrange(width // 4), rng.randrange(height // 4)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        draw.rectangle([x, y, x + w, y + h], fill=color)
+    img.save(file, format=fmt.upper())
+
+
+def _sentence(rng, words):
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def generate(folder, scenario):
+    """Write synthetic settings of a scenario into folder
+
+    Returns:
+        path of the settings file
+    """
+    subjects, max_pictures, kind = SCENARIOS[scenario]
+    rng = random.Random(SEED)
+    ext = "png" if PICTURES[kind][2] == "png" else "jpg"
+
+    os.makedirs(folder, exist_ok=True)
+    subject_files = []
+    count = 0
+    for sub in range(subjects):
+        sections = []
+        for pic in range(rng.randint(0, max_pictures)):
+            file = path.join(folder, "pic_{}.{}".format(count, ext))
+            if not path.isfile(file):
+                _make_picture(file, kind, count)
+            count += 1
+
+            picture = {
+                "name": "picture {}".format(pic),
+                "path": file,
+                "description": _sentence(rng, rng.randint(5, 30))
+            }
+            if rng.random() < 0.5:
+                items = [
+                    {"text": _sentence(rng, rng.randint(10, 80))},
+                    {"picture": picture}
+                ]
+            else:
+                items = [{"picture": picture}]
+            sections.append({"section {}".format(pic): items})
+
+        sections.append({
+            "summary": [{"text": _sentence(rng, rng.randint(20, 200))}]
+        })
+        subject = {
+            "title": "Subject {}".format(sub),
+            "info": _sentence(rng, rng.randint(5, 40)),
+            "sections": sections
+        }
+        file = path.join(folder, "subject_{}.yml".format(sub))
+        with open(file, "w") as f:
+            yaml.safe_dump(subject, f)
+        subject_files.append(path.basename(file))
+
+    settings = path.join(folder, "report_setting.yml")
+    with open(settings, "w") as f:
+        yaml.safe_dump({
+            "format": "WeeklyReport",
+            "author": "bench",
+            "date": "2018-05-01",
+            "subjects": subject_files
+        }, f)
+    return settings
+
+
+def _phases(report):
+    """Seconds per phase of the bench out of a profile report"""
+    seconds = {
+        name: phase["seconds"] for name, phase in report["phases"].items()
+    }
+    return {
+        "yaml": seconds.get("settings", 0.0) + seconds.get("subjects", 0.0),
+        "probe": seconds.get("pictures", 0.0),
+        "layout": seconds.get("layout", 0.0),
+        # layout is planned while building slides
+        "shapes": seconds.get("slides", 0.0) - seconds.get("layout", 0.0),
+        "save": seconds.get("save", 0.0),
+    }
+
+
+def _clean(folder):
+    # every repeat is a cold build: no metadata, resample or memo caches
+    ut_simple.Subject.clear_cache()
+    for name in (".ut_autoreport_cache.json", ".ut_autoreport_images"):
+        target = path.join(folder, name)
+        if path.isdir(target):
+            shutil.rmtree(target)
+        elif path.isfile(target):
+            os.remove(target)
+
+
+def run(settings, out_file, options):
+    """Render once, returning seconds spent in each phase and in total"""
+    folder = path.dirname(settings)
+    _clean(folder)
+    start = time.perf_counter()
+    with _profile.profiling() as profiler:
+        ut_simple.render_report(settings, out_file, force=True, **options)
+    seconds = _phases(profiler.report())
+    seconds["total"] = time.perf_counter() - start
+    return seconds
+
+
+def bench(settings, out_file, options, repeat):
+    """Render repeatedly; median time per phase, peak memory, size"""
+    runs = [run(settings, out_file, options) for _ in range(repeat)]
+    seconds = {
+        phase: statistics.median(r[phase] for r in runs)
+        for phase in PHASES + ["total"]
+    }
+
+    # memory in a separate run, tracing slows everything down
+    _clean(path.dirname(settings))
+    tracemalloc.start()
+    try:
+        ut_simple.render_report(settings, out_file, force=True, **options)
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    import pptx
+    prs = pptx.Presentation(out_file)
+    return {
+        "seconds": seconds,
+        "peak_bytes": peak,
+        "output_bytes": path.getsize(out_file),
+        "slides": len(prs.slides)
+    }
+
+
+def compare(results, baseline, tolerance, min_delta=MIN_DELTA):
+    """List regressions of results against baseline
+
+    Returns:
+        list of str, one per metric worse than baseline by more than
+        tolerance, a fraction, and for phases by more than min_delta
+        seconds too
+    """
+    regressions = []
+    for name, result in results["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            continue
+
+        metrics = [
+            ("seconds." + phase, result["seconds"][phase],
+             base["seconds"].get(phase))
+            for phase in PHASES + ["total"]
+        ] + [
+            ("peak_bytes", result["peak_bytes"], base.get("peak_bytes")),
+            ("output_bytes", result["output_bytes"],
+             base.get("output_bytes")),
+        ]
+        for metric, value, old in metrics:
+            if old is None:
+                continue
+            # ignore noise on phases too short to measure
+            if metric.startswith("seconds.") and value - old <= min_delta:
+                continue
+            if value > old * (1 + tolerance):
+                msg = "{}: {} {:.4g} -> {:.4g} (+{:.0%})"
+                regressions.append(msg.format(
+                    name, metric, old, value, value / old - 1 if old else 1
+                ))
+    return regressions
+
+
+def _print_results(results):
+    header = "{:16}" + "{:>9}" * (len(PHASES) + 1) + "{:>10}{:>10}{:>7}"
+    print(header.format(
+        "scenario", *PHASES, "total", "peak MB", "size MB", "slides"
+    ))
+    row = "{:16}" + "{:9.3f}" * (len(PHASES) + 1) + "{:10.1f}{:10.1f}{:7}"
+    for name, r in results["scenarios"].items():
+        print(row.format(
+            name, *[r["seconds"][p] for p in PHASES + ["total"]],
+            r["peak_bytes"] / 2 ** 20, r["output_bytes"] / 2 ** 20,
+            r["slides"]
+        ))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark report generation on synthetic reports"
+    )
+    parser.add_argument(
+        "--scenario", nargs="+", choices=list(SCENARIOS),
+        default=list(SCENARIOS), help="scenarios to run, default to all"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3,
+        help="renders per scenario, the median is reported"
+    )
+    parser.add_argument(
+        "--work-dir", default=None,
+        help="keep generated inputs here, so re-runs skip generating them"
+    )
+    parser.add_argument("--output", help="write results to this .json")
+    parser.add_argument("--baseline", help="compare against this .json")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25,
+        help="allowed slow down / growth over the baseline, as fraction"
+    )
+    parser.add_argument(
+        "--min-delta", type=float, default=MIN_DELTA,
+        help="allowed slow down of a phase in seconds, whatever fraction"
+    )
+    parser.add_argument("--dpi", type=int, default=None)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--pack", action="store_true")
+    args = parser.parse_args(argv)
+
+    options = {
+        "dpi": args.dpi,
+        "streaming": args.stream,
+        "packing": args.pack
+    }
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="ut_bench_")
+
+    results = {
+        "meta": {
+            "date": dt.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "version": ut_simple.UTSimple.version,
+            "options": options,
+            "repeat": args.repeat
+        },
+        "scenarios": {}
+    }
+    try:
+        for name in args.scenario:
+            folder = path.join(work_dir, name)
+            settings = generate(folder, name)
+            out_file = path.join(folder, "out.pptx")
+            results["scenarios"][name] = bench(
+                settings, out_file, options, args.repeat
+            )
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    _print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(
+            results, baseline, args.tolerance, args.min_delta
+        )
+        for line in regressions:
+            print("REGRESSION " + line)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,344 @@
+"""Render reports in a long running local service
+
+Keeps a pool of worker processes with pptx, yaml and the banner assets
+loaded, and takes render jobs over HTTP on localhost:
+
+    python template/ut_service.py --port 8750 --workers 4
+    curl localhost:8750/render -H "Content-Type: application/json" \
+        -d '{"settings": "/abs/report_setting.yml",
+             "outputs": ["/abs/report.pptx"]}'
+
+POST /render waits for the job and answers its result as json, with the
+seconds it queued and ran, and the seconds of each phase of the render;
+GET /status answers the load of the service. Relative paths are resolved
+against the directory the service runs in. When all workers are busy and
+the queue is full, jobs are refused with 503 instead of piling up.
+Jobs must be sent as application/json, so browsers can't send them
+from other sites without a CORS preflight, which is never answered.
+"""
+import sys
+import os
+import json
+import time
+import hashlib
+import argparse
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import ut_simple
+from units import _profile
+from units.validation import ValidationError
+
+DEFAULT_PORT = 8750
+# jobs waiting for a worker, besides the ones running
+QUEUE_LIMIT = 16
+# request fields passed on to UTSimple
+OPTIONS = ("dpi", "quality", "streaming", "packing")
+# locks of the outputs being written, each output hashed onto one
+OUTPUT_LOCKS = 64
+
+
+class QueueFull(Exception):
+    """Raised when a job is refused, all workers and queue being taken"""
+
+
+def _warm():
+    # nothing to do, the initializer of the worker loads everything
+    return None
+
+
+def _render_job(settings_file, outputs, force, options):
+    # runs in a worker process
+    from units.remote import is_uri
+
+    started = time.time()
+    result = {"built": False, "error": None, "problems": None}
+    with _profile.profiling() as profiler:
+        try:
+            problems = ut_simple.validate_settings(settings_file)
+            if problems:
+                raise ValidationError(problems)
+
+            settings = ut_simple.ReportSettings.load(
+                os.path.basename(settings_file),
+                os.path.dirname(settings_file)
+            )
+            presentation = ut_simple.UTSimple(settings=settings, **options)
+            built = presentation.render(outputs, force=force)
+            result["built"] = any(built.values())
+
+            # roll-ups and .json settings also depend on which files
+            # their sources match, and remote pictures have no stamps;
+            # only stamps of plain reports tell whether a render is current
+            pictures = [
+                pic for sub in settings.subjects for pic in sub.pictures
+            ]
+            if settings.title not in ut_simple.ROLLUP_FORMATS \
+                    and not settings_file.endswith(".json") \
+                    and not any(is_uri(pic) for pic in pictures):
+                result["inputs"] = [settings_file] + [
+                    os.path.abspath(f) for f in settings.subject_files
+                ] + [os.path.abspath(pic) for pic in pictures]
+        except ValidationError as e:
+            result["error"] = str(e)
+            result["problems"] = [
+                {"file": p.file, "message": p.message} for p in e.problems
+            ]
+        except Exception:
+            result["error"] = traceback.format_exc(limit=3)
+
+    report = profiler.report()
+    result["started"] = started
+    result["seconds"] = report["seconds"]
+    result["phases"] = {
+        name: phase["seconds"] for name, phase in report["phases"].items()
+    }
+    return result
+
+
+class RenderService:
+    """Warm worker processes behind a bounded queue and a result cache
+
+    A job identical to an earlier one, same settings, outputs and
+    options, whose inputs and outputs are untouched since, is answered
+    from the cache without a worker.
+
+    Args:
+        workers: number of worker processes, default to cpu count
+        queue: jobs that may wait for a worker; more are refused
+    """
+
+    def __init__(self, workers=None, queue=QUEUE_LIMIT):
+        self._workers = workers or os.cpu_count() or 1
+        self._pool = ProcessPoolExecutor(
+            max_workers=self._workers,
+            initializer=ut_simple._init_worker
+        )
+        self._slots = threading.BoundedSemaphore(self._workers + queue)
+        self._queue = queue
+        self._lock = threading.Lock()
+        # request key -> (stamps of inputs and outputs, result)
+        self._cache = {}
+        # held by the jobs writing the outputs hashed onto them
+        self._writing = [threading.Lock() for _ in range(OUTPUT_LOCKS)]
+        self._stats = {
+            "pending": 0, "done": 0, "failed": 0, "cached": 0, "refused": 0
+        }
+
+    def warm_up(self):
+        """Start every worker now, so the first jobs don't pay for it"""
+        jobs = [self._pool.submit(_warm) for _ in range(self._workers)]
+        for job in jobs:
+            job.result()
+
+    def _output_locks(self, outputs):
+        # sorted, so jobs sharing outputs always lock them in one order
+        stripes = {hash(out) % len(self._writing) for out in outputs}
+        return [self._writing[i] for i in sorted(stripes)]
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    def status(self):
+        with self._lock:
+            status = dict(self._stats)
+            status["cache_entries"] = len(self._cache)
+        status["workers"] = self._workers
+        status["queue"] = self._queue
+        return status
+
+    def render(self, settings_file, outputs, force=False, options=None):
+        """Render settings into outputs in a worker, waiting for it
+
+        Returns:
+            dict with built, error, problems (list of file and message,
+            if the inputs are invalid), cached, queued_seconds, seconds
+            and phases
+
+        Raises:
+            QueueFull: if all workers are busy and the queue is full
+        """
+        settings_file = os.path.abspath(str(settings_file))
+        outputs = [os.path.abspath(str(out)) for out in outputs]
+        options = dict(options or {})
+        key = hashlib.sha1(json.dumps(
+            [settings_file, outputs, options], sort_keys=True
+        ).encode()).hexdigest()
+
+        start = time.perf_counter()
+        if not force:
+            with self._lock:
+                hit = self._cache.get(key)
+            if hit is not None and ut_simple._snapshot(hit[0]) == hit[0]:
+                self._count("cached")
+                result = dict(hit[1], built=False, cached=True)
+                result["queued_seconds"] = 0.0
+                result["seconds"] = time.perf_counter() - start
+                result["phases"] = {}
+                return result
+
+        if not self._slots.acquire(blocking=False):
+            self._count("refused")
+            msg = "{} jobs running or queued already"
+            raise QueueFull(msg.format(self._workers + self._queue))
+
+        self._count("pending")
+        submitted = time.time()
+        held = []
+        try:
+            # jobs writing the same file run one after the other
+            for lock in self._output_locks(outputs):
+                lock.acquire()
+                held.append(lock)
+            result = self._pool.submit(
+                _render_job, settings_file, outputs, force, options
+            ).result()
+        finally:
+            for lock in held:
+                lock.release()
+            self._count("pending", -1)
+            self._slots.release()
+
+        result["cached"] = False
+        result["queued_seconds"] = max(0.0, result.pop("started") - submitted)
+        inputs = result.pop("inputs", None)
+        if result["error"] is not None:
+            self._count("failed")
+            with self._lock:
+                self._cache.pop(key, None)
+            return result
+
+        self._count("done")
+        if inputs is not None:
+            stamps = ut_simple._snapshot(list(dict.fromkeys(inputs + outputs)))
+            with self._lock:
+                self._cache[key] = (stamps, result)
+        return result
+
+    def close(self):
+        self._pool.shutdown()
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def _reply(self, code, content, headers=None):
+        body = json.dumps(content, indent=2).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/status":
+            self._reply(404, {"error": "no such path: {}".format(self.path)})
+            return
+        self._reply(200, self.server.service.status())
+
+    def _parse_job(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"null")
+        if not isinstance(request, dict):
+            raise ValueError("expect a json object")
+
+        settings = request.get("settings")
+        outputs = request.get("outputs")
+        if isinstance(outputs, str):
+            outputs = [outputs]
+        if not isinstance(settings, str) or not outputs:
+            raise ValueError("settings and outputs are required")
+        for out in outputs:
+            if not str(out).endswith((".pptx", ".xlsx")):
+                msg = "Not supported output: {}; Can only be .pptx or .xlsx"
+                raise ValueError(msg.format(out))
+
+        options = request.get("options") or {}
+        unknown = set(options) - set(OPTIONS)
+        if unknown:
+            msg = "Not supported options: {}; Can only be {}"
+            raise ValueError(msg.format(sorted(unknown), OPTIONS))
+        return settings, outputs, bool(request.get("force")), options
+
+    def do_POST(self):
+        if self.path != "/render":
+            self._reply(404, {"error": "no such path: {}".format(self.path)})
+            return
+
+        if self.headers.get_content_type() != "application/json":
+            msg = "expect Content-Type: application/json"
+            self._reply(415, {"error": msg})
+            return
+
+        try:
+            settings, outputs, force, options = self._parse_job()
+        except ValueError as e:
+            self._reply(400, {"error": str(e)})
+            return
+
+        try:
+            result = self.server.service.render(
+                settings, outputs, force=force, options=options
+            )
+        except QueueFull as e:
+            self._reply(503, {"error": str(e)}, {"Retry-After": "1"})
+            return
+
+        if result["problems"]:
+            code = 422
+        elif result["error"]:
+            code = 500
+        else:
+            code = 200
+        self._reply(code, result)
+
+
+def serve(host="127.0.0.1", port=DEFAULT_PORT, workers=None,
+          queue=QUEUE_LIMIT):
+    """Run the service until interrupted"""
+    service = RenderService(workers=workers, queue=queue)
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.service = service
+    try:
+        service.warm_up()
+        msg = "serving on http://{}:{} with {} workers"
+        print(msg.format(
+            host, server.server_address[1], service.status()["workers"]
+        ))
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Render UTECHZONE reports as a local HTTP service"
+    )
+    parser.add_argument(
+        "--host", default="127.0.0.1",
+        help="address to listen on, default to localhost only"
+    )
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="number of worker processes, default to cpu count"
+    )
+    parser.add_argument(
+        "--queue", type=int, default=QUEUE_LIMIT,
+        help="jobs that may wait for a worker, more are refused with 503"
+    )
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.workers, args.queue)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,298 +1,1468 @@
-import sys
-import os
-from datetime import datetime as dt
-import pathlib
-import yaml
-import pptx
-from pptx.util import Inches as Inch
-from pptx.util import Pt
-from pptx.dml.color import RGBColor
-from pptx.enum.text import PP_ALIGN, MSO_AUTO_SIZE
-from pptx.enum.shapes import MSO_CONNECTOR as Line
-
-_path = os.path.dirname(os.path.dirname(__file__))
-if _path not in sys.path:
-    sys.path.append(_path)
-
-from units.cover import ReportCover  # noqa E402
-from units.figures import Figure  # noqa E402
-from units.subjects import SubjectTitle, Text  # noqa E402
-
-A4 = (Inch(7.5), Inch(10.83))
-SLDBLANK = 6
-PROJECT_DIR = pathlib.Path(os.path.realpath(__file__)).parents[1]
-
-
-class Subject:
-
-    def __init__(self, title, info, sections):
-        self._title = str(title)
-        self._info = str(info)
-
-        self._sections = []
-        for section in sections:
-            name, items = next(iter(section.items()))
-            items = [next(iter(item.keys())) for item in items]
-            if "text" not in items and "picture" not in items:
-                msg = "Section {} must have text and/or picture"
-                raise ValueError(msg.format(name))
-
-            self.sections.append(section)
-
-    def __str__(self):
-        display = "title: {}, info: {}, sections: {}"
-        return display.format(self.title, self.info, self.sections)
-
-    @property
-    def title(self):
-        return self._title
-
-    @property
-    def info(self):
-        return self._info
-
-    @property
-    def sections(self):
-        return self._sections
-
-    @classmethod
-    def to_yaml(cls, yml):
-        raise NotImplementedError()
-
-    @classmethod
-    def from_yaml(cls, yml, path=None):
-        if path is not None:
-            yml = pathlib.Path(path).joinpath(yml)
-
-        with open(str(yml), "r") as f:
-            subject = yaml.safe_load(f)
-
-        return cls(
-            subject['title'],
-            subject['info'],
-            subject['sections']
-        )
-
-
-class ReportSettings():
-
-    formats = ["WeeklyReport"]
-
-    def __init__(
-            self,
-            form,
-            subjects,
-            author=None,
-            date=None
-            ):
-
-        if form not in self.formats:
-            msg = "Not supported form: {}; Can only be one of {}"
-            raise NotImplementedError(msg.format(form, self.formats))
-
-        self._formats = form
-        self._author = str(author) if author else "UT-AUTO-REPORT"
-        self._date = dt.strptime(date, "%Y-%m-%d").date() if date else dt.now()
-
-        self._subject_files = []
-        self._subject_objs = []
-        for subject in subjects:
-            self._subject_objs.append(Subject.from_yaml(subject))
-            self._subject_files.append(subject)
-
-    @property
-    def title(self):
-        return self._formats
-
-    @property
-    def subjects(self):
-        return self._subject_objs
-
-    @property
-    def author(self):
-        return self._author
-
-    @property
-    def date(self):
-        return self._date
-
-    @classmethod
-    def to_yaml(cls, yml):
-        raise NotImplementedError()
-
-    @classmethod
-    def from_yaml(cls, yml, path=None):
-        if path is not None:
-            yml = pathlib.Path(path).joinpath(yml)
-            path = yml.parents[0]
-
-        with open(str(yml), "r") as f:
-            settings = yaml.safe_load(f)
-
-        subjects = settings['subjects']
-        if path is not None:
-            subjects = [str(path.joinpath(sub)) for sub in subjects]
-
-        return cls(
-            form=settings['format'],
-            subjects=subjects,
-            date=settings['date'],
-            author=settings['author']
-        )
-
-
-class UTSimple:
-
-    version = ["0.0beta"]
-
-    def __init__(self, settings: ReportSettings):
-
-        if not isinstance(settings, ReportSettings):
-            msg = "setting must be instance of ReportSettings"
-            raise TypeError(msg)
-
-        self.setting = settings
-
-    def to_pptx(self, file):
-        file = str(file)
-        if not file.endswith('.pptx'):
-            raise ValueError("Invalid save out file name")
-
-        # presentation wise settings
-        prs = pptx.Presentation()
-        prs.slide_height = A4[0]
-        prs.slide_width = A4[1]
-
-        core = prs.core_properties
-        core.author = self.setting.author
-        core.created = dt.now()
-        core.last_modified_by = self.setting.author
-        core.last_printed = dt.now()
-        core.modified = dt.now()
-        core.title = self.setting.formats
-        core.version = UTSimple.version
-
-        self.prs = prs
-        self._add_cover_slide()
-        for subject in self.setting.subjects:
-            self._add_subject_slides(subject)
-        self.prs.save(file)
-
-    def _add_cover_slide(self):
-
-        slide = self.prs.slides.add_slide(self.prs.slide_layouts[SLDBLANK])
-        shapes = slide.shapes
-
-        shapes.add_picture(
-            str(PROJECT_DIR.joinpath('./data/banner_utechzone_blue.png')),
-            left=0, top=0,
-            width=self.prs.slide_width
-            )
-
-        cover = ReportCover(
-            header=self.setting.title,
-            titles=[sub.title for sub in self.setting.subjects],
-            author=self.setting.author,
-            date=self.setting.date
-            )
-
-        cover.add_to_shapes(
-            shapes,
-            left=1.85,
-            top=1.72
-            )
-
-        shapes.add_picture(
-            str(PROJECT_DIR.joinpath('./data/banner_utechzone_blue.png')),
-            left=0, top=self.prs.slide_height - Inch(1.07),
-            width=self.prs.slide_width
-            )
-
-    def _add_subject_slides(self, subject):
-
-        slide = self.prs.slides.add_slide(self.prs.slide_layouts[SLDBLANK])
-        shapes = slide.shapes
-
-        title = SubjectTitle(
-            title=subject.title,
-            description=subject.info
-        )
-
-        title.add_to_shapes(
-            shapes,
-            left=0.25, top=0.18
-        )
-
-        _bottom = 0.18 + title.h
-        for section in subject.sections:
-            name, content = next(iter(section.items()))
-            content = [next(iter(item.items())) for item in content]
-            content = {k: v for k, v in content}
-
-            if "text" in content:
-
-                text = Text(title=name, content=content["text"])
-                text.add_to_shapes(
-                    shapes=shapes,
-                    left=0.25, top=_bottom+0.18
-                )
-                _bottom += 0.18 + text.h
-
-                if "picture" in content:
-                    fig = Figure(
-                        title=content["picture"]["name"],
-                        description=content["picture"]["description"],
-                        pic_path=content["picture"]["path"],
-                        size="small"
-                    )
-
-                    fig.add_to_shapes(
-                        shapes=shapes,
-                        left=0.25 + 0.62, top=_bottom+0.1
-                    )
-
-                    _bottom += 0.1 + fig.h
-
-            elif "picture" in content:
-
-                fig = Figure(
-                        title=content["picture"]["name"],
-                        description=content["picture"]["description"],
-                        pic_path=content["picture"]["path"],
-                        size="medium"
-                    )
-
-                fig.add_to_shapes(
-                    shapes=shapes,
-                    left=0.25, top=_bottom+0.18
-                )
-
-                _bottom += 0.18 + fig.h
-
-        # add banners
-        shapes.add_picture(
-            str(PROJECT_DIR.joinpath('./data/banner_utechzone_blue.png')),
-            left=0, top=self.prs.slide_height - Inch(1.07),
-            width=self.prs.slide_width
-            )
-
-
-if __name__ == "__main__":
-
-    yml = sys.argv[1]
-    out_f = sys.argv[2]
-
-    if not os.path.isabs(yml):
-        settings = ReportSettings.from_yaml(
-            yml,
-            os.getcwd()
-        )
-    else:
-        settings = ReportSettings.from_yaml(yml)
-
-    if not os.path.isabs(out_f):
-        out_f = pathlib.Path(os.getcwd()).joinpath(out_f)
-        out_f = str(out_f)
-
-    presentation = UTSimple(settings=settings)
-    presentation.to_pptx(out_f)
+import sys
+import os
+import glob
+import json
+import time
+import argparse
+import traceback
+import contextlib
+import collections
+import datetime
+from datetime import datetime as dt
+import pathlib
+import importlib.util
+
+# yaml, pptx and the units drawing with pptx are imported where they are
+# first needed, so --help, --validate and up to date rebuilds start fast
+
+if importlib.util.find_spec("units") is None:
+    # run from a source checkout, not installed
+    _path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if _path not in sys.path:
+        sys.path.append(_path)
+
+from units.cover import ReportCover, week_regime  # noqa E402
+from units.imagecache import ImageCache  # noqa E402
+from units.layout import paginate, pack_shelves, Shelf  # noqa E402
+from units.manifest import BuildManifest, fingerprint  # noqa E402
+from units.pictures import prepare_pictures, Resampler  # noqa E402
+from units.progress import ProgressIndex, load_json  # noqa E402
+from units.validation import Problem, ValidationError  # noqa E402
+from units.validation import check_settings, check_subject  # noqa E402
+from units.validation import check_pictures  # noqa E402
+from units.cover import SUBJECT_NUM_LIMITS, SUBJECT_TITLE_LIMITS  # noqa E402
+from units.cover import TEXT_TITLE_LIMITS  # noqa E402
+from units.cover import REGIMES, ROLLUP_FORMATS  # noqa E402
+from units._templates import SLDBLANK  # noqa E402
+from units import _profile  # noqa E402
+
+# slide height, width in Inch
+A4 = (7.5, 10.83)
+PROJECT_DIR = pathlib.Path(os.path.realpath(__file__)).parents[1]
+BANNER = "banner_utechzone_blue.png"
+BANNER_HEIGHT = 1.07
+# usable width between the slide margins, in Inch
+CONTENT_WIDTH = 10.33
+XLSX_COLUMNS = [
+    "Week Start", "Week End", "Author", "Subject", "Info",
+    "Section", "Text", "Picture", "Picture Path"
+]
+
+
+def _load_yaml(file):
+    import yaml
+
+    # libyaml's C loader is much faster, fallback to pure python if missing
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    with open(str(file), "r") as f:
+        return yaml.load(f, Loader=loader)
+
+
+def _as_date(value):
+    # yaml gives unquoted dates as date already
+    if isinstance(value, datetime.date):
+        return value
+    return dt.strptime(str(value), "%Y-%m-%d").date()
+
+
+class Subject:
+
+    # resolved path -> (mtime, size, Subject), least recently used first,
+    # see from_yaml
+    _loaded = collections.OrderedDict()
+    # subjects kept loaded, long running processes see ever more files
+    MAX_LOADED = 1024
+
+    def __init__(self, title, info, sections):
+        self._title = str(title)
+        self._info = str(info)
+
+        self._sections = []
+        for section in sections:
+            name, items = next(iter(section.items()))
+            items = [next(iter(item.keys())) for item in items]
+            if "text" not in items and "picture" not in items:
+                msg = "Section {} must have text and/or picture"
+                raise ValueError(msg.format(name))
+
+            self.sections.append(section)
+
+    def __str__(self):
+        display = "title: {}, info: {}, sections: {}"
+        return display.format(self.title, self.info, self.sections)
+
+    @property
+    def title(self):
+        return self._title
+
+    @property
+    def info(self):
+        return self._info
+
+    @property
+    def sections(self):
+        return self._sections
+
+    @property
+    def pictures(self):
+        """Paths of all pictures referenced by the sections"""
+        paths = []
+        for section in self.sections:
+            _name, items = next(iter(section.items()))
+            for item in items:
+                kind, content = next(iter(item.items()))
+                if kind == "picture":
+                    paths.append(str(content["path"]))
+        return paths
+
+    @classmethod
+    def to_yaml(cls, yml):
+        raise NotImplementedError()
+
+    @classmethod
+    def from_yaml(cls, yml, path=None, cached=True):
+        """Load Subject from yaml file
+
+        Loaded subjects are memoized by resolved path and mtime, so a file
+        referenced many times is parsed once and the Subject is shared;
+        the least recently used beyond MAX_LOADED are dropped. Pass
+        cached=False to always parse a fresh Subject.
+        """
+        if path is not None:
+            yml = pathlib.Path(path).joinpath(yml)
+
+        key = os.path.realpath(str(yml))
+        stat = os.stat(key)
+        if cached:
+            hit = cls._loaded.get(key)
+            if hit is not None and hit[:2] == (stat.st_mtime_ns, stat.st_size):
+                cls._loaded.move_to_end(key)
+                return hit[2]
+
+        with _profile.phase("subjects"):
+            subject = _load_yaml(key)
+            subject = cls(
+                subject['title'],
+                subject['info'],
+                subject['sections']
+            )
+        _profile.count("subjects parsed")
+
+        if cached:
+            # replaces the entry of an older version of the file
+            cls._loaded[key] = (stat.st_mtime_ns, stat.st_size, subject)
+            cls._loaded.move_to_end(key)
+            while len(cls._loaded) > cls.MAX_LOADED:
+                cls._loaded.popitem(last=False)
+        return subject
+
+    @classmethod
+    def clear_cache(cls):
+        cls._loaded.clear()
+
+
+class ReportSettings():
+
+    formats = list(REGIMES)
+
+    def __init__(
+            self,
+            form,
+            subjects,
+            author=None,
+            date=None,
+            file=None,
+            subject_files=None
+            ):
+        """
+        Args:
+            subjects: subject .yml files, or Subject objects
+            subject_files: if subjects are given as objects, the files
+                they are loaded from, so changes to them are tracked
+        """
+
+        if form not in self.formats:
+            msg = "Not supported form: {}; Can only be one of {}"
+            raise NotImplementedError(msg.format(form, self.formats))
+
+        self._formats = form
+        self._author = str(author) if author else "UT-AUTO-REPORT"
+        self._date = _as_date(date) if date else dt.now()
+        self._file = str(file) if file else None
+
+        self._subject_files = []
+        self._subject_objs = []
+        for subject in subjects:
+            if isinstance(subject, Subject):
+                self._subject_objs.append(subject)
+            else:
+                self._subject_objs.append(Subject.from_yaml(subject))
+                self._subject_files.append(subject)
+        if subject_files is not None:
+            self._subject_files.extend(str(f) for f in subject_files)
+
+    @property
+    def title(self):
+        return self._formats
+
+    @property
+    def subjects(self):
+        return self._subject_objs
+
+    @property
+    def author(self):
+        return self._author
+
+    @property
+    def date(self):
+        return self._date
+
+    @property
+    def file(self):
+        return self._file
+
+    @property
+    def subject_files(self):
+        return self._subject_files
+
+    @classmethod
+    def to_yaml(cls, yml):
+        raise NotImplementedError()
+
+    @classmethod
+    def from_yaml(cls, yml, path=None):
+        if path is not None:
+            yml = pathlib.Path(path).joinpath(yml)
+            path = yml.parents[0]
+
+        with _profile.phase("settings"):
+            settings = _load_yaml(yml)
+        if settings['format'] in ROLLUP_FORMATS:
+            return cls.from_rollup(settings, yml)
+
+        subjects = settings['subjects']
+        if path is not None:
+            subjects = [str(path.joinpath(sub)) for sub in subjects]
+
+        return cls(
+            form=settings['format'],
+            subjects=subjects,
+            date=settings['date'],
+            author=settings['author'],
+            file=yml
+        )
+
+    @classmethod
+    def from_rollup(cls, settings, file):
+        """Aggregate weekly reports into a monthly or quarterly one
+
+        The weekly settings found in "sources" (files, directories or
+        glob patterns relative to file) dated within the range of the
+        roll-up are read one at a time, oldest first; sections of
+        subjects with the same title are grouped under one subject, in
+        chronological order, each named after the week it's from. A
+        subject file listed by several weeks holds its latest content,
+        so it's dated by the latest week listing it. Only the sections
+        are kept, so memory grows with the text of the range, not with
+        the number of weekly files.
+
+        Args:
+            settings: the parsed roll-up settings
+            file: path of the roll-up settings
+        """
+        file = pathlib.Path(file).absolute()
+        folder = file.parents[0]
+        start, end = REGIMES[settings['format']](_as_date(settings['date']))
+
+        sources = settings['sources']
+        if isinstance(sources, str):
+            sources = [sources]
+        weeks = weekly_reports(
+            [str(folder.joinpath(src)) for src in sources], start, end
+        )
+
+        def subject_files(weekly, content):
+            folder = os.path.dirname(weekly)
+            return [
+                os.path.realpath(os.path.join(folder, str(sub)))
+                for sub in content['subjects']
+            ]
+
+        # subject file -> latest week listing it, weeks being by date
+        latest = {}
+        for date, weekly, content in weeks:
+            for sub in subject_files(weekly, content):
+                latest[sub] = date
+
+        # casefolded title -> [title, info, sections], in order of first
+        # dated sections
+        merged = {}
+        tracked = []
+        seen = set()
+        for date, weekly, content in weeks:
+            tracked.append(weekly)
+            for sub in subject_files(weekly, content):
+                if sub in seen or latest[sub] != date:
+                    continue
+                seen.add(sub)
+                tracked.append(sub)
+
+                subject = Subject.from_yaml(sub, cached=False)
+                week = week_regime(date)[0].isoformat()
+                sections = [
+                    {"{} {}".format(week, name): items}
+                    for section in subject.sections
+                    for name, items in section.items()
+                ]
+                key = subject.title.strip().casefold()
+                entry = merged.setdefault(key, [subject.title, None, []])
+                # the latest info describes the subject best
+                entry[1] = subject.info
+                entry[2].extend(sections)
+
+        return cls(
+            form=settings['format'],
+            subjects=[Subject(*merged[key]) for key in merged],
+            date=str(settings['date']),
+            author=settings.get('author'),
+            file=file,
+            subject_files=tracked
+        )
+
+    @classmethod
+    def from_json(cls, file, path=None):
+        """Load settings from .json file, merging Projects and Progress
+
+        Besides format, author and date, the settings may list "sources"
+        sources: .json files, directories or glob patterns relative to
+        the settings, default to the folder of the settings. Every
+        Project with Progress becomes a subject, see ProgressIndex.
+        """
+        if path is not None:
+            file = pathlib.Path(path).joinpath(file)
+        file = pathlib.Path(file).absolute()
+        folder = file.parents[0]
+
+        with _profile.phase("settings"):
+            settings = load_json(file)
+            sources = settings.get('sources', ["."])
+            if isinstance(sources, str):
+                sources = [sources]
+            sources = [str(folder.joinpath(src)) for src in sources]
+
+            index = ProgressIndex.from_sources([str(file)] + sources)
+            subjects = [
+                Subject(name, index.info(name) or "", index.sections(name))
+                for name in index.projects if index.progress(name)
+            ]
+        return cls(
+            form=settings['format'],
+            subjects=subjects,
+            date=settings.get('date'),
+            author=settings.get('author'),
+            file=file,
+            subject_files=[f for f in index.files if f != str(file)]
+        )
+
+    @classmethod
+    def from_archive(cls, archive, file):
+        """Load settings as archived, see units.archive.ReportArchive
+
+        Subjects come from the archive, not from their files, so a
+        report renders even if its yamls are gone; pictures are still
+        read from their paths.
+        """
+        report = archive.report(file)
+        subjects = [
+            Subject(sub["title"], sub["info"], sub["sections"])
+            for sub in report["subjects"]
+        ]
+        return cls(
+            form=report["format"],
+            subjects=subjects,
+            date=report["date"],
+            author=report["author"]
+        )
+
+    @classmethod
+    def load(cls, file, path=None):
+        """Load settings from .yml or .json file, by its extension"""
+        if str(file).endswith(".json"):
+            return cls.from_json(file, path)
+        return cls.from_yaml(file, path)
+
+
+class UTSimple:
+
+    version = ["0.0beta"]
+
+    def __init__(
+            self,
+            settings: ReportSettings,
+            dpi=None, quality=85, memo=None, streaming=None,
+            packing=False
+            ):
+        """
+        Args:
+            settings: the ReportSettings to render
+            dpi: if given, pictures are downscaled to this resolution
+                at their displayed size before embedding
+            quality: JPEG quality used when re-encoding photos
+            memo: optional dict kept across renders, to reuse pictures
+                already loaded in memory when they didn't change
+            streaming: if set, pictures are not loaded into memory; their
+                bytes are copied from file into the .pptx when saving;
+                default to set for roll-ups only
+            packing: if set, consecutive picture-only sections are packed
+                side by side in rows, with captions under the pictures
+        """
+
+        if not isinstance(settings, ReportSettings):
+            msg = "setting must be instance of ReportSettings"
+            raise TypeError(msg)
+
+        self.setting = settings
+        self.dpi = dpi
+        self.quality = quality
+        self.memo = memo
+        if streaming is None:
+            # roll-ups show the pictures of many weeks
+            streaming = settings.title in ROLLUP_FORMATS
+        self.streaming = streaming
+        self.packing = packing
+
+    def to_pptx(self, file, force=False):
+        """Render settings into .pptx file
+
+        A report built from a settings file is skipped when its output
+        is already built from the exact same settings, subjects, pictures
+        and options, unless force is set.
+
+        Returns:
+            True if the file is (re)built, False if it's up to date
+        """
+        file = str(file)
+        if not file.endswith('.pptx'):
+            raise ValueError("Invalid save out file name")
+
+        # picture metadata persists next to the settings file
+        if self.setting.file is not None:
+            self.cache = ImageCache.beside(self.setting.file)
+        else:
+            self.cache = ImageCache()
+
+        # http(s):// and file:// pictures, as local files
+        local = self._fetch_pictures()
+
+        manifest = None
+        if self.setting.file is not None:
+            manifest = BuildManifest(file)
+            with _profile.phase("fingerprint"):
+                inputs = fingerprint(
+                    self.setting.file,
+                    self.setting.subject_files,
+                    list(local.values()),
+                    cache=self.cache,
+                    options={
+                        "version": UTSimple.version,
+                        "dpi": self.dpi,
+                        "quality": self.quality,
+                        "packing": self.packing,
+                        "period": self._period()
+                    }
+                )
+            if not force and manifest.is_current(inputs):
+                self.cache.save()
+                return False
+
+        import pptx
+        from pptx.util import Inches as Inch
+
+        # presentation wise settings
+        prs = pptx.Presentation()
+        prs.slide_height = Inch(A4[0])
+        prs.slide_width = Inch(A4[1])
+
+        core = prs.core_properties
+        core.author = self.setting.author
+        core.created = dt.now()
+        core.last_modified_by = self.setting.author
+        core.last_printed = dt.now()
+        core.modified = dt.now()
+        core.title = self.setting.title
+        core.version = UTSimple.version
+
+        if self.dpi is None:
+            self.resampler = None
+        elif self.setting.file is not None:
+            self.resampler = Resampler.beside(
+                self.setting.file, dpi=self.dpi, quality=self.quality
+            )
+        else:
+            self.resampler = Resampler(dpi=self.dpi, quality=self.quality)
+
+        # load every picture up front, so slides only consume blobs
+        loaded = prepare_pictures(
+            list(local.values()),
+            cache=self.cache,
+            memo=self.memo,
+            keep_blob=not self.streaming
+        )
+        self.pictures = {pic: loaded[local[pic]] for pic in local}
+
+        self.prs = prs
+        with _profile.phase("slides"):
+            self._add_cover_slide()
+            for subject in self.setting.subjects:
+                self._add_subject_slides(subject)
+        if _profile.enabled():
+            _profile.count("slides", len(prs.slides))
+            _profile.count(
+                "shapes created", sum(len(sld.shapes) for sld in prs.slides)
+            )
+
+        with _profile.phase("save"):
+            if self.streaming:
+                from units import streaming
+                streaming.save(self.prs, file)
+            else:
+                self.prs.save(file)
+        self.cache.save()
+
+        if manifest is not None:
+            manifest.record(inputs)
+        return True
+
+    def _fetch_pictures(self):
+        """Map every picture path of the subjects to a local file
+
+        Raises:
+            ValidationError: listing the pictures that can't be fetched
+        """
+        from units.remote import RemoteCache, fetch_pictures
+
+        if self.setting.file is not None:
+            remote = RemoteCache.beside(self.setting.file)
+        else:
+            remote = RemoteCache.in_tempdir()
+
+        with _profile.phase("fetch"):
+            local, errors = fetch_pictures(
+                [pic for sub in self.setting.subjects for pic in sub.pictures],
+                remote
+            )
+        if errors:
+            raise ValidationError(
+                Problem(uri, "can't fetch picture: {}".format(error))
+                for uri, error in errors.items()
+            )
+        return local
+
+    def _period(self):
+        # without a date the report covers the current week, so the same
+        # settings render another report once the week is over
+        day = self.setting.date
+        if isinstance(day, dt):
+            day = day.date()
+        start, end = REGIMES[self.setting.title](day)
+        return [start.isoformat(), end.isoformat()]
+
+    def to_xlsx(self, file, force=False):
+        """Write summary of the report into .xlsx file
+
+        One row per section of every subject, written through a write-only
+        workbook so memory stays flat however many rows there are. Like
+        to_pptx, skipped if already built from the same settings and
+        subjects, unless force is set.
+
+        Returns:
+            True if the file is (re)built, False if it's up to date
+        """
+        file = str(file)
+        if not file.endswith('.xlsx'):
+            raise ValueError("Invalid save out file name")
+
+        manifest = None
+        if self.setting.file is not None:
+            manifest = BuildManifest(file)
+            # pictures are only listed by path, their content doesn't matter
+            with _profile.phase("fingerprint"):
+                inputs = fingerprint(
+                    self.setting.file,
+                    self.setting.subject_files,
+                    [],
+                    options={
+                        "version": UTSimple.version,
+                        "period": self._period()
+                    }
+                )
+            if not force and manifest.is_current(inputs):
+                return False
+
+        with _profile.phase("xlsx"):
+            self._write_xlsx(file)
+
+        if manifest is not None:
+            manifest.record(inputs)
+        return True
+
+    def _write_xlsx(self, file):
+        import openpyxl
+
+        start, end = REGIMES[self.setting.title](self.setting.date)
+        book = openpyxl.Workbook(write_only=True)
+        sheet = book.create_sheet(title=self.setting.title)
+        sheet.append(XLSX_COLUMNS)
+
+        for subject in self.setting.subjects:
+            if not subject.sections:
+                sheet.append([
+                    start, end, self.setting.author,
+                    subject.title, subject.info
+                ])
+            for section in subject.sections:
+                name, content = next(iter(section.items()))
+                content = [next(iter(item.items())) for item in content]
+                content = {k: v for k, v in content}
+                picture = content.get("picture") or {}
+                sheet.append([
+                    start, end, self.setting.author,
+                    subject.title, subject.info, name,
+                    str(content.get("text", "")).strip(),
+                    picture.get("name"), picture.get("path")
+                ])
+
+        book.save(file)
+
+    def render(self, outputs, force=False):
+        """Render settings into every given output file
+
+        The kind of each output is picked by its extension, .pptx or
+        .xlsx; all of them share the settings and subjects loaded once.
+
+        Returns:
+            dict of output file -> True if (re)built, False if up to date
+        """
+        outputs = [str(out) for out in outputs]
+        for out in outputs:
+            if not out.endswith((".pptx", ".xlsx")):
+                msg = "Not supported output: {}; Can only be .pptx or .xlsx"
+                raise ValueError(msg.format(out))
+
+        built = {}
+        for out in outputs:
+            if out.endswith(".pptx"):
+                built[out] = self.to_pptx(out, force=force)
+            else:
+                built[out] = self.to_xlsx(out, force=force)
+        return built
+
+    def _add_cover_slide(self):
+        from pptx.util import Inches as Inch
+        from units.assets import REGISTRY
+
+        slide = self.prs.slides.add_slide(self.prs.slide_layouts[SLDBLANK])
+        shapes = slide.shapes
+
+        REGISTRY.add_picture(
+            shapes, BANNER,
+            left=0, top=0,
+            width=self.prs.slide_width
+            )
+
+        # the cover lists as many subjects as fit, then sums up the rest
+        titles = [sub.title for sub in self.setting.subjects]
+        if len(titles) > SUBJECT_NUM_LIMITS:
+            more = len(titles) - SUBJECT_NUM_LIMITS + 1
+            titles = titles[:SUBJECT_NUM_LIMITS - 1]
+            titles.append("and {} more".format(more))
+
+        cover = ReportCover(
+            header=self.setting.title,
+            titles=titles,
+            author=self.setting.author,
+            date=self.setting.date,
+            regime=REGIMES[self.setting.title]
+            )
+
+        cover.add_to_shapes(
+            shapes,
+            left=1.85,
+            top=1.72
+            )
+
+        REGISTRY.add_picture(
+            shapes, BANNER,
+            left=0, top=self.prs.slide_height - Inch(BANNER_HEIGHT),
+            width=self.prs.slide_width
+            )
+
+    def _subject_blocks(self, subject):
+        """Measure every section of subject into (unit, left, gap) blocks"""
+        from units.figures import Figure
+        from units.subjects import Text
+
+        blocks = []
+        gallery = []
+        for section in subject.sections:
+            name, content = next(iter(section.items()))
+            content = [next(iter(item.items())) for item in content]
+            content = {k: v for k, v in content}
+
+            if "text" in content:
+
+                blocks.extend(self._gallery_blocks(gallery))
+                gallery = []
+
+                text = Text(title=name, content=content["text"])
+                blocks.append((text, 0.25, 0.18))
+
+                if "picture" in content:
+                    fig = Figure(
+                        title=content["picture"]["name"],
+                        description=content["picture"]["description"],
+                        pic_path=content["picture"]["path"],
+                        size="small",
+                        picture=self.pictures[str(content["picture"]["path"])],
+                        resampler=self.resampler
+                    )
+                    blocks.append((fig, 0.25 + 0.62, 0.1))
+
+            elif "picture" in content and self.packing:
+
+                fig = Figure(
+                        title=content["picture"]["name"],
+                        description=content["picture"]["description"],
+                        pic_path=content["picture"]["path"],
+                        size="small",
+                        picture=self.pictures[str(content["picture"]["path"])],
+                        resampler=self.resampler,
+                        caption="below"
+                    )
+                gallery.append(fig)
+
+            elif "picture" in content:
+
+                fig = Figure(
+                        title=content["picture"]["name"],
+                        description=content["picture"]["description"],
+                        pic_path=content["picture"]["path"],
+                        size="medium",
+                        picture=self.pictures[str(content["picture"]["path"])],
+                        resampler=self.resampler
+                    )
+                blocks.append((fig, 0.25, 0.18))
+
+        blocks.extend(self._gallery_blocks(gallery))
+        return blocks
+
+    def _gallery_blocks(self, figures):
+        """Pack figures into rows, each row being one block"""
+        shelves = pack_shelves(
+            [fig.w for fig in figures],
+            width=CONTENT_WIDTH,
+            spacing=0.2
+        )
+
+        blocks = []
+        for shelf in shelves:
+            units = [figures[index] for index, _offset in shelf]
+            offsets = [offset for _index, offset in shelf]
+            blocks.append((Shelf(units, offsets), 0.25, 0.18))
+        return blocks
+
+    def _add_subject_slides(self, subject):
+        from pptx.util import Inches as Inch
+        from pptx.util import Emu
+        from units.assets import REGISTRY
+        from units.subjects import SubjectTitle
+
+        title = SubjectTitle(
+            title=subject.title,
+            description=subject.info
+        )
+        cont_title = SubjectTitle(title=subject.title, continued=True)
+
+        # plan all pages up front, sections never overlap the banner
+        with _profile.phase("layout"):
+            blocks = self._subject_blocks(subject)
+            pages = paginate(
+                [(unit.h, gap) for unit, _left, gap in blocks],
+                first_top=0.18 + title.h,
+                top=0.18 + cont_title.h,
+                bottom=Emu(self.prs.slide_height).inches - BANNER_HEIGHT
+            )
+
+        for page_num, page in enumerate(pages):
+            slide = self.prs.slides.add_slide(
+                self.prs.slide_layouts[SLDBLANK]
+            )
+            shapes = slide.shapes
+
+            head = title if page_num == 0 else cont_title
+            head.add_to_shapes(
+                shapes,
+                left=0.25, top=0.18
+            )
+
+            for index, top in page:
+                unit, left, _gap = blocks[index]
+                unit.add_to_shapes(
+                    shapes=shapes,
+                    left=left, top=top
+                )
+
+            # add banners
+            REGISTRY.add_picture(
+                shapes, BANNER,
+                left=0, top=self.prs.slide_height - Inch(BANNER_HEIGHT),
+                width=self.prs.slide_width
+                )
+
+
+def _validate_yaml(settings_file, section_limit=TEXT_TITLE_LIMITS,
+                   content=None):
+    import yaml
+
+    # yaml raises ValueError on unquoted invalid dates, e.g. 2018-13-01
+    errors = (OSError, yaml.YAMLError, ValueError, TypeError)
+    problems = []
+    if content is None:
+        try:
+            content = _load_yaml(settings_file)
+        except errors as e:
+            return [Problem(settings_file, "can't load: {}".format(e))], []
+    problems.extend(
+        Problem(settings_file, msg)
+        for msg in check_settings(content, ReportSettings.formats)
+    )
+    if isinstance(content, dict) and content.get("format") in ROLLUP_FORMATS:
+        if problems:
+            return problems, []
+        return _validate_rollup(settings_file, content)
+
+    subjects = content.get("subjects") if isinstance(content, dict) else None
+    if not isinstance(subjects, list):
+        return problems, []
+
+    pictures = []
+    folder = os.path.dirname(settings_file)
+    for sub in dict.fromkeys(str(sub) for sub in subjects):
+        sub = os.path.join(folder, sub)
+        try:
+            subject = _load_yaml(sub)
+        except errors as e:
+            problems.append(Problem(sub, "can't load: {}".format(e)))
+            continue
+        found, pics = check_subject(subject, section_limit)
+        problems.extend(Problem(sub, msg) for msg in found)
+        pictures.extend((sub, pic) for pic in pics)
+    return problems, pictures
+
+
+def _validate_rollup(settings_file, content):
+    folder = os.path.dirname(settings_file)
+    sources = content["sources"]
+    if isinstance(sources, str):
+        sources = [sources]
+    try:
+        start, end = REGIMES[content["format"]](_as_date(content["date"]))
+    except ValueError as e:
+        return [Problem(settings_file, str(e))], []
+
+    weeks = weekly_reports(
+        [os.path.join(folder, str(src)) for src in sources], start, end
+    )
+    if not weeks:
+        msg = "no weekly settings dated from {} to {} in sources"
+        return [Problem(settings_file, msg.format(start, end))], []
+
+    # section names are prefixed with the week they are from
+    section_limit = TEXT_TITLE_LIMITS - len("YYYY-MM-DD ")
+    problems, pictures = [], []
+    for _date, weekly, weekly_content in weeks:
+        found, pics = _validate_yaml(weekly, section_limit, weekly_content)
+        problems.extend(found)
+        pictures.extend(pics)
+    return problems, pictures
+
+
+def _validate_json(settings_file):
+    # the merge itself is the schema check of Projects and Progress
+    try:
+        settings = ReportSettings.from_json(settings_file)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        return [Problem(settings_file, "can't load: {!r}".format(e))], []
+
+    problems = []
+    for sub in settings.subjects:
+        if len(sub.title) > SUBJECT_TITLE_LIMITS:
+            msg = "project {!r} can have at most {} characters"
+            problems.append(Problem(
+                settings_file, msg.format(sub.title, SUBJECT_TITLE_LIMITS)
+            ))
+        for section in sub.sections:
+            name = next(iter(section))
+            if len(name) > TEXT_TITLE_LIMITS:
+                msg = "section {!r} can have at most {} characters"
+                problems.append(Problem(
+                    settings_file, msg.format(name, TEXT_TITLE_LIMITS)
+                ))
+
+    pictures = [
+        (settings_file, pic)
+        for sub in settings.subjects for pic in sub.pictures
+    ]
+    return problems, pictures
+
+
+def validate_settings(settings_file):
+    """Check a settings file, its subjects and pictures, without rendering
+
+    Every file is parsed and checked against the schema, and every
+    picture is stat-ed in parallel, so all problems are found at once.
+
+    Returns:
+        list of Problem, empty if the report can be rendered
+    """
+    from units.remote import RemoteCache, fetch_pictures, is_uri
+
+    settings_file = os.path.abspath(str(settings_file))
+    with _profile.phase("validate"):
+        if settings_file.endswith(".json"):
+            problems, pictures = _validate_json(settings_file)
+        else:
+            problems, pictures = _validate_yaml(settings_file)
+
+        # remote pictures are fetched, so later renders find them cached
+        uris = [pic for _file, pic in pictures if is_uri(pic)]
+        local, errors = {}, {}
+        if uris:
+            local, errors = fetch_pictures(
+                uris, RemoteCache.beside(settings_file)
+            )
+
+        missing = check_pictures(
+            local.get(pic, pic) for _file, pic in pictures if pic not in errors
+        )
+        for file, pic in pictures:
+            if pic in errors:
+                problem = "can't fetch picture: {}".format(errors[pic])
+                problems.append(Problem(file, problem))
+                continue
+            problem = missing.get(os.path.abspath(local.get(pic, pic)))
+            if problem:
+                problems.append(
+                    Problem(file, "{}: {}".format(problem, pic))
+                )
+    return problems
+
+
+def render_report(settings_file, out_file, force=False, **options):
+    """Render one settings file into .pptx and/or .xlsx files
+
+    Args:
+        settings_file: the settings .yml or .json
+        out_file: the .pptx or .xlsx to write, or a list of them
+        force: rebuild even if the outputs are up to date
+        options: passed to UTSimple, e.g. dpi, streaming or packing
+
+    Returns:
+        True if any file is (re)built, False if all are up to date
+
+    Raises:
+        ValidationError: with every problem of the inputs, before any
+            rendering work
+    """
+    settings_file = os.path.abspath(str(settings_file))
+    if isinstance(out_file, (str, pathlib.Path)):
+        out_file = [out_file]
+    outputs = [os.path.abspath(str(out)) for out in out_file]
+
+    problems = validate_settings(settings_file)
+    if problems:
+        raise ValidationError(problems)
+
+    settings = ReportSettings.load(
+        os.path.basename(settings_file),
+        os.path.dirname(settings_file)
+    )
+    presentation = UTSimple(settings=settings, **options)
+    return any(presentation.render(outputs, force=force).values())
+
+
+def _snapshot(files):
+    stamps = {}
+    for file in files:
+        try:
+            stat = os.stat(file)
+            stamps[file] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stamps[file] = None
+    return stamps
+
+
+def watch_report(settings_file, out_file, interval=0.2, **options):
+    """Re-render settings into out_file(s) whenever any input changes
+
+    Polls the settings file, its subjects and their pictures every
+    interval seconds. Unchanged subjects and pictures are kept in memory
+    between renders, so a re-render only reloads what changed. Runs
+    until interrupted. Extra options are passed to UTSimple.
+    """
+    settings_file = os.path.abspath(str(settings_file))
+    if isinstance(out_file, (str, pathlib.Path)):
+        out_file = [out_file]
+    outputs = [os.path.abspath(str(out)) for out in out_file]
+    memo = {}
+    watched = [settings_file]
+    snapshot = None
+
+    while True:
+        current = _snapshot(watched)
+        if current == snapshot:
+            time.sleep(interval)
+            continue
+
+        start = time.perf_counter()
+        try:
+            settings = ReportSettings.load(
+                os.path.basename(settings_file),
+                os.path.dirname(settings_file)
+            )
+            watched = [settings_file] + [
+                os.path.abspath(f) for f in settings.subject_files
+            ] + [
+                os.path.abspath(pic)
+                for sub in settings.subjects for pic in sub.pictures
+            ]
+            watched = list(dict.fromkeys(watched))
+            # stamp before rendering, so edits made meanwhile are caught
+            snapshot = _snapshot(watched)
+
+            presentation = UTSimple(settings=settings, memo=memo, **options)
+            presentation.render(outputs, force=True)
+            msg = "[{}] rendered {} in {:.2f}s"
+            print(msg.format(
+                dt.now().strftime("%H:%M:%S"), ", ".join(outputs),
+                time.perf_counter() - start
+            ))
+        except Exception as e:
+            # most likely a half-saved file, wait for the next change
+            msg = "[{}] failed: {}"
+            print(msg.format(dt.now().strftime("%H:%M:%S"), e))
+            snapshot = current
+
+        # memo is keyed by absolute path, like watched
+        for file in set(memo) - set(watched):
+            del memo[file]
+
+
+def _load_settings_file(file):
+    # the parsed settings, None if file doesn't look like report settings
+    import yaml
+
+    try:
+        content = _load_yaml(file)
+    except (OSError, yaml.YAMLError, ValueError, TypeError):
+        return None
+    if isinstance(content, dict) and "subjects" in content \
+            and "format" in content:
+        return content
+    return None
+
+
+def weekly_reports(sources, start, end):
+    """Weekly settings in sources dated from start to end
+
+    Returns:
+        list of (date, file, content), sorted by date, content being the
+        parsed settings
+    """
+    weeks = []
+    for file, content in _find_settings(sources):
+        if content.get("format") != "WeeklyReport" or not content.get("date"):
+            continue
+        date = _as_date(content["date"])
+        if start <= date <= end:
+            weeks.append((date, file, content))
+    weeks.sort(key=lambda week: week[:2])
+    return weeks
+
+
+def _find_settings(sources):
+    # yield (file, parsed settings), each file parsed once
+    found = set()
+    for source in sources:
+        source = str(source)
+        if os.path.isdir(source):
+            pattern = os.path.join(source, "**", "*.yml")
+            candidates = glob.glob(pattern, recursive=True)
+        else:
+            candidates = glob.glob(source, recursive=True)
+
+        for file in sorted(candidates):
+            file = os.path.abspath(file)
+            if file in found:
+                continue
+            content = _load_settings_file(file)
+            if content is not None:
+                found.add(file)
+                yield file, content
+
+
+def find_settings(sources):
+    """Expand directories and glob patterns into settings files
+
+    Directories are searched recursively for .yml files; only files that
+    look like report settings (having format and subjects) are kept.
+    """
+    return [file for file, _content in _find_settings(sources)]
+
+
+def _output_names(files, out_dir):
+    stems = [pathlib.Path(f).stem for f in files]
+    if len(set(stems)) != len(stems):
+        # e.g. everyone's report_setting.yml in their own folder
+        stems = [
+            "{}_{}".format(pathlib.Path(f).parent.name, stem)
+            for f, stem in zip(files, stems)
+        ]
+    return [os.path.join(str(out_dir), stem + ".pptx") for stem in stems]
+
+
+def _init_worker():
+    # pay for the imports and shared assets once per worker, not per report
+    from units.assets import REGISTRY
+    import units.figures  # noqa F401
+    import units.subjects  # noqa F401
+    REGISTRY.preload()
+
+
+def _batch_job(settings_file, out_file, force, options):
+    start = time.perf_counter()
+    built = False
+    error = None
+    try:
+        built = render_report(settings_file, out_file, force, **options)
+    except ValidationError as e:
+        error = str(e)
+    except Exception:
+        error = traceback.format_exc(limit=3)
+
+    return {
+        "settings": settings_file,
+        "output": out_file,
+        "seconds": time.perf_counter() - start,
+        "built": built,
+        "error": error
+    }
+
+
+def render_batch(sources, out_dir, workers=None, force=False, xlsx=False,
+                 **options):
+    """Render many settings files in a pool of worker processes
+
+    Args:
+        sources: directories and/or glob patterns of settings files
+        out_dir: directory to write the .pptx files into
+        workers: number of worker processes, default to cpu count
+        force: rebuild reports even if they are up to date
+        xlsx: also write a summary .xlsx next to every .pptx
+        options: passed to UTSimple of every report
+
+    Returns:
+        list of dict, one per report, with settings, output, seconds,
+        built (False if skipped as up to date) and error (None if the
+        report succeeded)
+    """
+    files = find_settings(sources)
+    if not files:
+        return []
+
+    os.makedirs(str(out_dir), exist_ok=True)
+    outputs = _output_names(files, out_dir)
+    if xlsx:
+        outputs = [
+            [out, os.path.splitext(out)[0] + ".xlsx"] for out in outputs
+        ]
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = min(workers or os.cpu_count() or 1, len(files))
+    with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker
+            ) as pool:
+        jobs = [
+            pool.submit(_batch_job, f, out, force, options)
+            for f, out in zip(files, outputs)
+        ]
+        return [job.result() for job in jobs]
+
+
+def archive_reports(archive_file, sources):
+    """Add or update settings found in sources into an archive
+
+    Returns:
+        (updated, errors), see ReportArchive.update
+    """
+    from units.archive import ReportArchive
+
+    with ReportArchive(archive_file) as archive:
+        return archive.update(find_settings(sources))
+
+
+def _print_matches(matches, elapsed):
+    for m in matches:
+        print("{}  {}  {}".format(m["date"] or "-", m["title"], m["settings"]))
+        if m["snippet"]:
+            print("    " + " ".join(m["snippet"].split()))
+    print("{} matches in {:.1f}ms".format(len(matches), elapsed * 1000))
+
+
+def _print_summary(results, elapsed):
+    failed = [r for r in results if r["error"] is not None]
+    for r in results:
+        if r["error"]:
+            status = "FAILED"
+        else:
+            status = "built" if r["built"] else "skip"
+        print("{:8.2f}s  {:6}  {}".format(r["seconds"], status, r["settings"]))
+    for r in failed:
+        print("\n{}:\n{}".format(r["settings"], r["error"]))
+
+    msg = "{} reports, {} failed, {:.2f}s wall time"
+    print(msg.format(len(results), len(failed), elapsed))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate UTECHZONE report from yaml settings"
+    )
+    parser.add_argument(
+        "settings", nargs="?", help="report settings .yml or .json file"
+    )
+    parser.add_argument(
+        "output", nargs="*",
+        help="output .pptx and/or .xlsx files"
+    )
+    parser.add_argument(
+        "--dpi", type=int, default=None,
+        help="downscale pictures to this dpi at their displayed size"
+    )
+    parser.add_argument(
+        "--quality", type=int, default=85,
+        help="JPEG quality for re-encoded photos, used with --dpi"
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="rebuild even if the output is up to date"
+    )
+    parser.add_argument(
+        "--stream", action="store_true", default=None,
+        help="copy pictures from file into the .pptx instead of memory, "
+             "default for monthly and quarterly reports"
+    )
+    parser.add_argument(
+        "--pack", action="store_true",
+        help="pack picture-only sections side by side in rows"
+    )
+    parser.add_argument(
+        "--validate", action="store_true",
+        help="only check settings, subjects and pictures, render nothing"
+    )
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="keep running and re-render whenever inputs change"
+    )
+    parser.add_argument(
+        "--batch", nargs="+", metavar="SOURCE",
+        help="directories or glob patterns of settings files to render"
+    )
+    parser.add_argument(
+        "--out-dir", default=".",
+        help="where --batch writes its .pptx files"
+    )
+    parser.add_argument(
+        "--xlsx", action="store_true",
+        help="with --batch, also write a summary .xlsx for every report"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="number of worker processes for --batch"
+    )
+    parser.add_argument(
+        "--summary", default=None,
+        help="write --batch timings and failures to this .json file"
+    )
+    parser.add_argument(
+        "--profile", default=None, metavar="FILE",
+        help="write phase timings and counters of the render to this .json"
+    )
+    parser.add_argument(
+        "--profile-mode", choices=_profile.MODES, default=None,
+        help="with --profile, also profile functions or memory allocations"
+    )
+    parser.add_argument(
+        "--archive", default=None, metavar="DB",
+        help="the archive .sqlite of past reports, for the options below"
+    )
+    parser.add_argument(
+        "--ingest", nargs="+", metavar="SOURCE",
+        help="add or update settings in these directories or globs"
+    )
+    parser.add_argument(
+        "--search", nargs="?", const="", default=None, metavar="QUERY",
+        help="full-text search of archived subjects, e.g. 'lens calib*'"
+    )
+    parser.add_argument(
+        "--since", default=None, metavar="YYYY-MM-DD",
+        help="with --search, only reports of weeks ending on or after"
+    )
+    parser.add_argument(
+        "--until", default=None, metavar="YYYY-MM-DD",
+        help="with --search, only reports of weeks starting on or before"
+    )
+    parser.add_argument(
+        "--from-archive", action="store_true",
+        help="render settings as archived instead of from their files"
+    )
+    args = parser.parse_args(argv)
+    if args.profile and (args.batch or args.watch):
+        parser.error("--profile works on a single render only")
+    archiving = args.ingest or args.search is not None or args.from_archive
+    if archiving and not args.archive:
+        parser.error("--ingest, --search and --from-archive need --archive")
+
+    options = {
+        "dpi": args.dpi,
+        "quality": args.quality,
+        "streaming": args.stream,
+        "packing": args.pack
+    }
+
+    if args.validate:
+        if args.batch:
+            files = find_settings(args.batch)
+        elif args.settings:
+            files = [args.settings]
+        else:
+            parser.error("--validate needs settings or --batch")
+
+        failed = 0
+        for file in files:
+            problems = validate_settings(file)
+            if problems:
+                failed += 1
+                print(ValidationError(problems))
+                continue
+            print("ok: {}".format(file))
+        return 1 if failed else 0
+
+    if args.ingest or args.search is not None:
+        from units.archive import ReportArchive
+
+        if args.ingest:
+            start = time.perf_counter()
+            updated, errors = archive_reports(args.archive, args.ingest)
+            for file, error in errors.items():
+                print("FAILED {}: {}".format(file, error))
+            msg = "{} settings updated, {} failed, {:.2f}s"
+            print(msg.format(
+                len(updated), len(errors), time.perf_counter() - start
+            ))
+        if args.search is not None:
+            with ReportArchive(args.archive) as archive:
+                start = time.perf_counter()
+                try:
+                    matches = archive.search(
+                        args.search or None, args.since, args.until
+                    )
+                except ValueError as e:
+                    print(e)
+                    return 1
+            _print_matches(matches, time.perf_counter() - start)
+        return 1 if args.ingest and errors else 0
+
+    if args.from_archive:
+        if args.settings is None or not args.output:
+            parser.error("--from-archive needs settings and output")
+        from units.archive import ReportArchive
+
+        with ReportArchive(args.archive) as archive:
+            try:
+                settings = ReportSettings.from_archive(
+                    archive, os.path.abspath(args.settings)
+                )
+            except KeyError as e:
+                print(e.args[0])
+                return 1
+        presentation = UTSimple(settings=settings, **options)
+        presentation.render(
+            [os.path.abspath(out) for out in args.output], force=True
+        )
+        return 0
+
+    if args.batch:
+        start = time.perf_counter()
+        results = render_batch(
+            args.batch, args.out_dir,
+            workers=args.workers, force=args.force, xlsx=args.xlsx,
+            **options
+        )
+        _print_summary(results, time.perf_counter() - start)
+        if args.summary:
+            with open(args.summary, "w") as f:
+                json.dump(results, f, indent=2)
+        return 1 if any(r["error"] for r in results) else 0
+
+    if args.settings is None or not args.output:
+        parser.error("settings and output are required without --batch")
+
+    yml = args.settings
+    outputs = args.output
+
+    if args.watch:
+        try:
+            watch_report(yml, outputs, **options)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    with contextlib.ExitStack() as stack:
+        if args.profile:
+            profiler = stack.enter_context(
+                _profile.profiling(args.profile_mode)
+            )
+
+        problems = validate_settings(yml)
+        if problems:
+            print(ValidationError(problems))
+            return 1
+
+        if not os.path.isabs(yml):
+            settings = ReportSettings.load(
+                yml,
+                os.getcwd()
+            )
+        else:
+            settings = ReportSettings.load(yml)
+
+        outputs = [
+            str(pathlib.Path(os.getcwd()).joinpath(out))
+            if not os.path.isabs(out) else out
+            for out in outputs
+        ]
+
+        presentation = UTSimple(settings=settings, **options)
+        presentation.render(outputs, force=args.force)
+
+    if args.profile:
+        with open(args.profile, "w") as f:
+            json.dump(profiler.report(), f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import os
+import os.path as path
+import sys
+import shutil
+import tempfile
+import threading
+import unittest
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from units.remote import RemoteCache, fetch_pictures  # noqa: E402
+
+
+class _Handler(SimpleHTTPRequestHandler):
+    """Static files, counting the requests answered 200 and 304"""
+
+    def send_response(self, code, message=None):
+        self.server.codes.append(code)
+        super().send_response(code, message)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FetchPicturesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.served = path.join(self.root, "served")
+        os.makedirs(self.served)
+        with open(path.join(self.served, "pic.png"), "wb") as f:
+            f.write(b"\x89PNG\r\n\x1a\n" + b"\0" * 1000)
+
+        self.server = ThreadingHTTPServer(
+            ("127.0.0.1", 0), partial(_Handler, directory=self.served)
+        )
+        self.server.codes = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = "http://127.0.0.1:{}/".format(self.server.server_port)
+        self.cache = RemoteCache(path.join(self.root, "cache"))
+        RemoteCache._fresh.clear()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        RemoteCache._fresh.clear()
+        shutil.rmtree(self.root)
+
+    def test_fetch(self):
+        url = self.base + "pic.png"
+        paths, errors = fetch_pictures([url], self.cache)
+        self.assertEqual(errors, {})
+        with open(paths[url], "rb") as f:
+            self.assertEqual(len(f.read()), 1008)
+        self.assertEqual(self.server.codes, [200])
+
+    def test_revalidate(self):
+        url = self.base + "pic.png"
+        first, _ = fetch_pictures([url], self.cache)
+
+        # a new process: same folder, nothing fetched recently
+        RemoteCache._fresh.clear()
+        cache = RemoteCache(self.cache.folder)
+        paths, errors = fetch_pictures([url], cache)
+        self.assertEqual(errors, {})
+        self.assertEqual(paths[url], first[url])
+        self.assertEqual(self.server.codes, [200, 304])
+
+        # fetched just now, the server isn't asked again
+        fetch_pictures([url], cache)
+        self.assertEqual(self.server.codes, [200, 304])
+
+    def test_not_found(self):
+        url = self.base + "missing.png"
+        paths, errors = fetch_pictures([url], self.cache)
+        self.assertNotIn(url, paths)
+        self.assertIn("HTTP 404", errors[url])
+        self.assertIsNone(self.cache.local_path(url))
+
+    def test_too_large(self):
+        url = self.base + "pic.png"
+        paths, errors = fetch_pictures([url], self.cache, max_bytes=100)
+        self.assertNotIn(url, paths)
+        self.assertIn("larger than 100 bytes", errors[url])
+        self.assertIsNone(self.cache.local_path(url))
+
+    def test_local_paths(self):
+        local = path.join(self.served, "pic.png")
+        uri = "file://" + local.replace(os.sep, "/")
+        paths, errors = fetch_pictures([local, uri], self.cache)
+        self.assertEqual(errors, {})
+        self.assertEqual(paths[local], local)
+        self.assertEqual(path.normpath(paths[uri]), path.normpath(local))
+        self.assertEqual(self.server.codes, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
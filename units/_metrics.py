@@ -0,0 +1,137 @@
+import re
+import functools
+import unicodedata
+
+# glyph advance widths of printable ascii (32 ~ 126), in 1/1000 em
+_ARIAL = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333,
+    278, 278, 556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278,
+    584, 584, 584, 556, 1015, 667, 667, 722, 722, 667, 611, 778, 722, 278,
+    500, 667, 556, 833, 722, 778, 667, 778, 722, 667, 611, 722, 667, 944,
+    667, 667, 611, 278, 278, 278, 469, 556, 333, 556, 556, 500, 556, 556,
+    278, 556, 556, 222, 222, 500, 222, 833, 556, 556, 556, 556, 333, 500,
+    278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584
+]
+_TIMES = [
+    250, 333, 408, 500, 500, 833, 778, 180, 333, 333, 500, 564, 250, 333,
+    250, 278, 500, 500, 500, 500, 500, 500, 500, 500, 500, 500, 278, 278,
+    564, 564, 564, 444, 921, 722, 667, 667, 722, 611, 556, 722, 722, 333,
+    389, 722, 611, 889, 722, 722, 556, 722, 667, 556, 611, 722, 722, 944,
+    722, 722, 611, 333, 278, 333, 469, 500, 333, 444, 500, 444, 500, 444,
+    333, 500, 500, 278, 278, 500, 278, 778, 500, 500, 500, 500, 333, 389,
+    278, 500, 500, 722, 500, 500, 444, 480, 200, 480, 541
+]
+
+# font name -> (ascii advances, advance of other narrow glyphs)
+FONTS = {
+    "Arial": (_ARIAL, 556),
+    "Times New Roman": (_TIMES, 500),
+}
+FULL_WIDTH = 1000
+LINE_SPACING = 1.2
+
+# ranges of full-width (CJK) glyphs, any of which can be wrapped on its own
+_FULL_WIDTH_RANGES = (
+    "\u1100-\u115f\u2e80-\ua4cf\uac00-\ud7a3\uf900-\ufaff"
+    "\ufe30-\ufe4f\uff00-\uff60\uffe0-\uffe6"
+)
+# tokens are: a full-width glyph, a run of spaces, or a word
+_TOKENS = re.compile(
+    r"[{0}]|\s+|[^\s{0}]+".format(_FULL_WIDTH_RANGES)
+)
+
+
+def _font(font):
+    try:
+        return FONTS[font]
+    except KeyError:
+        msg = "No metrics for font: {}; Can only be one of {}"
+        raise ValueError(msg.format(font, list(FONTS)))
+
+
+@functools.lru_cache(maxsize=4096)
+def _char_width(char, font):
+    table, default = _font(font)
+    code = ord(char)
+    if 32 <= code <= 126:
+        return table[code - 32]
+    if char == "\t":
+        return 4 * table[0]
+    if unicodedata.east_asian_width(char) in ("W", "F"):
+        return FULL_WIDTH
+    if unicodedata.combining(char):
+        return 0
+    return default
+
+
+@functools.lru_cache(maxsize=65536)
+def _token_width(token, font):
+    return sum(_char_width(char, font) for char in token)
+
+
+def text_width(text, font, size):
+    """Width of a single line of text in Inch
+
+    Args:
+        text: the text, without line breaks
+        font: font name, one of FONTS
+        size: font size in Pt
+    """
+    units = sum(_token_width(t, font) for t in _TOKENS.findall(text))
+    return units * size / 1000 / 72
+
+
+def line_height(size):
+    """Height of one line of single spaced text in Inch"""
+    return size * LINE_SPACING / 72
+
+
+def count_lines(text, font, size, width):
+    """Number of lines text takes once word-wrapped into given width
+
+    Each paragraph (separated by a line break) is wrapped greedily by
+    words; full-width CJK glyphs may break anywhere, and words longer
+    than a whole line are broken by glyphs.
+
+    Args:
+        text: the text
+        font: font name, one of FONTS
+        size: font size in Pt
+        width: available line width in Inch
+    """
+    # line width in 1/1000 em, the unit of the tables
+    capacity = width * 72 / size * 1000
+    if capacity <= 0:
+        msg = "Width must be positive, got {}"
+        raise ValueError(msg.format(width))
+
+    count = 0
+    for paragraph in str(text).rstrip("\n").split("\n"):
+        count += 1
+        used = 0
+        for token in _TOKENS.findall(paragraph):
+            advance = _token_width(token, font)
+            if token.isspace() or used + advance <= capacity:
+                used += advance
+                continue
+
+            if advance <= capacity:
+                count += 1
+                used = advance
+                continue
+
+            # a word wider than a line, break it by glyphs
+            if used > 0:
+                count += 1
+                used = 0
+            for char in token:
+                char_advance = _char_width(char, font)
+                if used + char_advance > capacity and used > 0:
+                    count += 1
+                    used = 0
+                used += char_advance
+    return count
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,177 @@
+import time
+import threading
+import contextlib
+
+MODES = ("cprofile", "tracemalloc")
+TOP_ENTRIES = 30
+
+
+class _NullPhase:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+# the running Profiler, None when profiling is disabled
+_active = None
+
+
+class _Phase:
+
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._profiler.add_time(self._name, time.perf_counter() - self._start)
+        return False
+
+
+class Profiler:
+    """Phase timers and counters of a render, optionally with a profiler
+
+    Phases may nest, e.g. "layout" happens within "slides", and may run
+    in many threads at once; each phase reports its summed wall time and
+    number of calls.
+
+    Args:
+        mode: None, or one of MODES to also collect function level timing
+            (of the rendering thread) or allocations
+    """
+
+    def __init__(self, mode=None):
+        if mode is not None and mode not in MODES:
+            msg = "Not supported profile mode: {}; Can only be one of {}"
+            raise ValueError(msg.format(mode, MODES))
+
+        self._mode = mode
+        self._phases = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._profile = None
+        self._snapshot = None
+        self._peak = None
+        self._start = None
+        self._seconds = None
+
+    @property
+    def mode(self):
+        return self._mode
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            total, calls = self._phases.get(name, (0.0, 0))
+            self._phases[name] = (total + seconds, calls + 1)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def start(self):
+        if self._mode == "cprofile":
+            import cProfile
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        elif self._mode == "tracemalloc":
+            import tracemalloc
+            tracemalloc.start()
+        self._start = time.perf_counter()
+
+    def stop(self):
+        self._seconds = time.perf_counter() - self._start
+        if self._mode == "cprofile":
+            self._profile.disable()
+        elif self._mode == "tracemalloc":
+            import tracemalloc
+            self._peak = tracemalloc.get_traced_memory()[1]
+            self._snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+
+    def report(self):
+        """Everything collected, as a json-able dict"""
+        report = {
+            "seconds": self._seconds,
+            "phases": {
+                name: {"seconds": seconds, "calls": calls}
+                for name, (seconds, calls) in sorted(self._phases.items())
+            },
+            "counters": dict(sorted(self._counters.items()))
+        }
+        if self._profile is not None:
+            report["functions"] = self._top_functions()
+        if self._snapshot is not None:
+            report["memory"] = {
+                "peak_bytes": self._peak,
+                "top": [
+                    {"line": str(stat.traceback), "bytes": stat.size,
+                     "count": stat.count}
+                    for stat in self._snapshot.statistics("lineno")[
+                        :TOP_ENTRIES]
+                ]
+            }
+        return report
+
+    def _top_functions(self):
+        import pstats
+        stats = pstats.Stats(self._profile).stats
+        rows = [
+            {
+                "function": "{}:{}({})".format(*func),
+                "calls": calls,
+                "own_seconds": own,
+                "cumulative_seconds": cumulative
+            }
+            for func, (_prim, calls, own, cumulative, _callers)
+            in stats.items()
+        ]
+        rows.sort(key=lambda row: row["cumulative_seconds"], reverse=True)
+        return rows[:TOP_ENTRIES]
+
+
+def enabled():
+    return _active is not None
+
+
+def phase(name):
+    """Context manager timing a phase, a shared no-op when disabled"""
+    if _active is None:
+        return _NULL_PHASE
+    return _active.phase(name)
+
+
+def count(name, n=1):
+    """Add n to a counter, does nothing when disabled"""
+    if _active is not None:
+        _active.count(name, n)
+
+
+@contextlib.contextmanager
+def profiling(mode=None):
+    """Enable profiling within the block, yielding the Profiler"""
+    global _active
+    if _active is not None:
+        raise RuntimeError("Already profiling")
+
+    profiler = Profiler(mode)
+    _active = profiler
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        _active = None
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,87 @@
+import copy
+import threading
+
+SLDBLANK = 6
+
+_lock = threading.Lock()
+_scratch = []
+
+
+def _scratch_shapes():
+    # one throwaway slide per process to draw the templates on
+    if not _scratch:
+        import pptx
+        prs = pptx.Presentation()
+        slide = prs.slides.add_slide(prs.slide_layouts[SLDBLANK])
+        _scratch.append(slide.shapes)
+    return _scratch[0]
+
+
+class ShapeTemplate:
+    """A styled textbox drawn once with python-pptx, then only cloned
+
+    build(shapes) draws the textbox with every paragraph, run and style
+    in place, usually with empty texts; its xml is kept as the template.
+    Adding it clones the xml and fills in id, position and the texts of
+    the runs, instead of setting every style through python-pptx again.
+
+    Args:
+        build: callable(shapes) -> the drawn textbox
+    """
+
+    def __init__(self, build):
+        self._build = build
+        self._sp = None
+
+    def _compile(self):
+        with _lock:
+            if self._sp is None:
+                shape = self._build(_scratch_shapes())
+                sp = shape._element
+                sp.getparent().remove(sp)
+                self._sp = sp
+        return self._sp
+
+    def add_to_shapes(self, shapes, left, top, width, height, texts):
+        """Add a clone of the template into given shapes
+
+        Args:
+            shapes: the shape refernce to add
+            left, top, width, height: position and size, in Emu
+            texts: one per run of the template, in order; a list in
+                place of a str repeats the paragraph of that run once
+                for every item of it
+
+        Returns:
+            the added shape
+        """
+        sp = copy.deepcopy(self._compile())
+        runs = sp.xpath(".//a:r")
+        if len(runs) != len(texts):
+            msg = "Template has {} runs, got {} texts"
+            raise ValueError(msg.format(len(runs), len(texts)))
+
+        for run, text in zip(runs, texts):
+            if isinstance(text, str):
+                run.text = text
+                continue
+
+            paragraph = run.getparent()
+            for item in text:
+                clone = copy.deepcopy(paragraph)
+                clone.xpath("./a:r")[0].text = str(item)
+                paragraph.addprevious(clone)
+            paragraph.getparent().remove(paragraph)
+
+        id_ = shapes._next_shape_id
+        sp.nvSpPr.cNvPr.id = id_
+        sp.nvSpPr.cNvPr.name = "TextBox %d" % (id_ - 1)
+        sp.x, sp.y, sp.cx, sp.cy = left, top, width, height
+
+        shapes._spTree.insert_element_before(sp, "p:extLst")
+        shapes._recalculate_extents()
+        return shapes._shape_factory(sp)
+
+
+if __name__ == "__main__":
+    pass
@@ -1,24 +1,165 @@
-def line_counter(text, capacity_per_line):
-    lines = text.split("\n")
-
-    count = 0
-    for line in lines:
-        length = 0
-        for word in line.split():
-            length += len(word)
-            if length > capacity_per_line:
-                if len(word) <= capacity_per_line:
-                    count += 1
-                    length = len(word)
-                else:
-                    # encounter a long word(> capacity)
-                    count += word // capacity_per_line
-                    length = word % capacity_per_line
-
-        if length != 0:
-            count += 1
-
-    return count
-
-if __name__ == "__main__":
-    pass
+import os
+import os.path as path
+import struct
+import threading
+import contextlib
+
+
+def replace_file(tmp, file):
+    """Move a fully written temporary file in place of file
+
+    Writers racing to replace the same file each move their own
+    temporary file; when a replace is refused, e.g. on Windows while
+    another writer's replace is in progress, the file that other writer
+    moved is kept and tmp is dropped.
+    """
+    try:
+        os.replace(tmp, file)
+    except OSError:
+        if not path.isfile(file):
+            raise
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def temp_name(file):
+    """Name of a temporary file beside file, unique to this thread"""
+    return "{}.{}.{}.tmp".format(file, os.getpid(), threading.get_ident())
+
+
+@contextlib.contextmanager
+def atomic_write(file, mode="w"):
+    """Open a temporary file unique to this writer beside file, to be
+    moved in place of file once written, see replace_file"""
+    tmp = temp_name(file)
+    try:
+        with open(tmp, mode) as f:
+            yield f
+    except BaseException:
+        os.remove(tmp)
+        raise
+    replace_file(tmp, file)
+
+
+def _png_size(head, f):
+    if head[12:16] != b"IHDR":
+        return None
+    width, height = struct.unpack(">II", head[16:24])
+    return height, width
+
+
+def _gif_size(head, f):
+    width, height = struct.unpack("<HH", head[6:10])
+    return height, width
+
+
+def _bmp_size(head, f):
+    header_size, = struct.unpack("<I", head[14:18])
+    if header_size == 12:
+        width, height = struct.unpack("<HH", head[18:22])
+    else:
+        width, height = struct.unpack("<ii", head[18:26])
+    return abs(height), width
+
+
+def _jpeg_size(head, f):
+    # walk the marker segments until a start-of-frame shows up
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) != 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        if code == 0xFF:
+            # fill byte, re-sync on the next one
+            f.seek(-1, 1)
+            continue
+        if code == 0x01 or 0xD0 <= code <= 0xD7:
+            continue
+
+        length = f.read(2)
+        if len(length) != 2:
+            return None
+        length, = struct.unpack(">H", length)
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            sof = f.read(5)
+            if len(sof) != 5:
+                return None
+            height, width = struct.unpack(">xHH", sof)
+            return height, width
+        f.seek(length - 2, 1)
+
+
+def _tiff_size(head, f):
+    endian = "<" if head[:2] == b"II" else ">"
+    f.seek(4)
+    offset, = struct.unpack(endian + "I", f.read(4))
+    f.seek(offset)
+    entries, = struct.unpack(endian + "H", f.read(2))
+
+    found = {}
+    for _ in range(entries):
+        entry = f.read(12)
+        if len(entry) != 12:
+            break
+        tag, kind = struct.unpack(endian + "HH", entry[:4])
+        if tag not in (256, 257):
+            continue
+        # value is either SHORT(3) or LONG(4)
+        if kind == 3:
+            value, = struct.unpack(endian + "H", entry[8:10])
+        else:
+            value, = struct.unpack(endian + "I", entry[8:12])
+        found[tag] = value
+        if len(found) == 2:
+            return found[257], found[256]
+    return None
+
+
+_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "png", _png_size),
+    (b"GIF87a", "gif", _gif_size),
+    (b"GIF89a", "gif", _gif_size),
+    (b"BM", "bmp", _bmp_size),
+    (b"\xff\xd8", "jpeg", _jpeg_size),
+    (b"II*\x00", "tiff", _tiff_size),
+    (b"MM\x00*", "tiff", _tiff_size),
+]
+
+
+def _read_image_size(f):
+    head = f.read(32)
+    for magic, fmt, reader in _SIGNATURES:
+        if not head.startswith(magic):
+            continue
+        try:
+            shape = reader(head, f)
+        except struct.error:
+            return None
+        if shape is None:
+            return None
+        return shape[0], shape[1], fmt
+    return None
+
+
+def image_size(img_path):
+    """Read pixel size of an image from its header, without decoding
+
+    Args:
+        img_path: path to a PNG, GIF, BMP, JPEG or TIFF file, or a
+            seekable binary file object
+
+    Returns:
+        (height, width, format), or None if the header is not recognized
+    """
+    if hasattr(img_path, "read"):
+        return _read_image_size(img_path)
+
+    with open(str(img_path), "rb") as f:
+        return _read_image_size(f)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,437 @@
+import os
+import os.path as path
+import json
+import sqlite3
+import datetime
+
+from .cover import week_regime
+from .imagecache import file_sha1
+
+ARCHIVE_VERSION = 2
+SNIPPET_WORDS = 12
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sha1 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    format TEXT,
+    author TEXT,
+    date TEXT,
+    week_start TEXT,
+    week_end TEXT
+);
+CREATE INDEX IF NOT EXISTS reports_week ON reports (week_start, week_end);
+CREATE TABLE IF NOT EXISTS subjects (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    sha1 TEXT NOT NULL,
+    title TEXT,
+    info TEXT,
+    sections TEXT,
+    UNIQUE (path, sha1)
+);
+CREATE TABLE IF NOT EXISTS report_subjects (
+    report_id INTEGER NOT NULL,
+    subject_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (report_id, position)
+);
+CREATE INDEX IF NOT EXISTS report_subjects_subject
+    ON report_subjects (subject_id);
+"""
+
+
+def _load_yaml(file):
+    import yaml
+
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    with open(str(file), "r") as f:
+        return yaml.load(f, Loader=loader)
+
+
+def _parse_date(date):
+    if not date:
+        return None
+    if isinstance(date, datetime.date):
+        return date
+    return datetime.datetime.strptime(str(date), "%Y-%m-%d").date()
+
+
+def _subject_text(sections):
+    """Section names, texts and picture captions of a subject, as text"""
+    parts = []
+    for section in sections:
+        name, items = next(iter(section.items()))
+        parts.append(str(name))
+        for item in items:
+            kind, value = next(iter(item.items()))
+            if kind == "text":
+                parts.append(str(value))
+            elif kind == "picture":
+                parts.append(str(value.get("name", "")))
+                parts.append(str(value.get("description", "")))
+    return "\n".join(parts)
+
+
+class ReportArchive:
+    """Full-text index of past report settings and their subjects
+
+    Kept in one SQLite file. Settings and subjects are re-read only when
+    their mtime or size changed, and re-indexed only when their content
+    hash did too, so updating a large archive mostly costs a stat per
+    file. Subjects are indexed with FTS5, falling back to a plain table
+    searched with LIKE if SQLite is built without it.
+
+    Every content of a subject file is kept as its own version, and a
+    report keeps the versions it had when its week was over, so it is
+    searched and rendered as it was, though the same subject files are
+    edited for the weeks after.
+
+    Args:
+        file: the .sqlite file, created if missing
+    """
+
+    def __init__(self, file):
+        self._file = str(file)
+        # transactions are explicit, see update
+        self._db = sqlite3.connect(self._file, isolation_level=None)
+
+        version = self._db.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, ARCHIVE_VERSION):
+            self._db.close()
+            msg = "Archive {} has version {}, expect {}"
+            raise ValueError(msg.format(self._file, version, ARCHIVE_VERSION))
+        self._db.executescript(_SCHEMA)
+        self._fts = self._create_text_table()
+        self._db.execute("PRAGMA user_version = {}".format(ARCHIVE_VERSION))
+
+    def _create_text_table(self):
+        try:
+            self._db.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS subject_text "
+                "USING fts5(title, info, body)"
+            )
+            return True
+        except sqlite3.OperationalError:
+            # no fts5 module, keep the same columns in a plain table
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS subject_text "
+                "(title TEXT, info TEXT, body TEXT)"
+            )
+            return False
+
+    @property
+    def file(self):
+        return self._file
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _changed(self, file):
+        """Stat, and hash if needed, file against its last ingest
+
+        Returns:
+            None if unchanged, else the (mtime_ns, size, sha1) to record
+        """
+        stat = os.stat(file)
+        row = self._db.execute(
+            "SELECT mtime_ns, size, sha1 FROM files WHERE path = ?", (file,)
+        ).fetchone()
+        if row is not None and row[:2] == (stat.st_mtime_ns, stat.st_size):
+            return None
+
+        sha1 = file_sha1(file)
+        if row is not None and row[2] == sha1:
+            # touched but same content, only remember the new stamp
+            self._record(file, (stat.st_mtime_ns, stat.st_size, sha1))
+            return None
+        return stat.st_mtime_ns, stat.st_size, sha1
+
+    def _record(self, file, stamp):
+        self._db.execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+            (file,) + tuple(stamp)
+        )
+
+    def _subject_id(self, file):
+        """Id of the current version of a subject file, indexing it if new
+
+        Returns:
+            (id, new), new if this version wasn't indexed before
+        """
+        stamp = self._changed(file)
+        if stamp is None:
+            sha1, = self._db.execute(
+                "SELECT sha1 FROM files WHERE path = ?", (file,)
+            ).fetchone()
+        else:
+            sha1 = stamp[2]
+        row = self._db.execute(
+            "SELECT id FROM subjects WHERE path = ? AND sha1 = ?",
+            (file, sha1)
+        ).fetchone()
+        if row is not None:
+            if stamp is not None:
+                self._record(file, stamp)
+            return row[0], False
+
+        content = _load_yaml(file)
+        if not isinstance(content, dict):
+            msg = "Expect a mapping in subject {}"
+            raise ValueError(msg.format(file))
+        title = str(content.get("title", ""))
+        info = str(content.get("info", ""))
+        sections = content.get("sections") or []
+
+        subject_id = self._db.execute(
+            "INSERT INTO subjects (path, sha1, title, info, sections) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (file, sha1, title, info, json.dumps(sections, default=str))
+        ).lastrowid
+        self._db.execute(
+            "INSERT INTO subject_text (rowid, title, info, body) "
+            "VALUES (?, ?, ?, ?)",
+            (subject_id, title, info, _subject_text(sections))
+        )
+        if stamp is not None:
+            self._record(file, stamp)
+        return subject_id, True
+
+    def _drop_unused_subjects(self):
+        # versions no report refers to anymore
+        unused = (
+            "SELECT id FROM subjects WHERE id NOT IN "
+            "(SELECT subject_id FROM report_subjects)"
+        )
+        self._db.execute(
+            "DELETE FROM subject_text WHERE rowid IN ({})".format(unused)
+        )
+        self._db.execute("DELETE FROM subjects WHERE id IN ({})".format(
+            unused
+        ))
+
+    def _stamp(self, file):
+        stat = os.stat(file)
+        return stat.st_mtime_ns, stat.st_size, file_sha1(file)
+
+    def add(self, settings_file):
+        """Index one settings .yml and its subjects, if any changed
+
+        Returns:
+            True if anything is (re)indexed, False if all is up to date
+        """
+        settings_file = path.abspath(str(settings_file))
+        row = self._db.execute(
+            "SELECT id, week_start FROM reports WHERE path = ?",
+            (settings_file,)
+        ).fetchone()
+        stamp = self._changed(settings_file)
+
+        if row is not None and stamp is None:
+            # settings unchanged; once the next week started, subjects
+            # edited since are meant for the weeks after
+            report_id, week_start = row
+            if week_start is not None:
+                next_week = _parse_date(week_start) + datetime.timedelta(7)
+                if next_week <= datetime.date.today():
+                    return False
+
+            subjects = self._db.execute(
+                "SELECT r.position, r.subject_id, s.path "
+                "FROM report_subjects r "
+                "JOIN subjects s ON s.id = r.subject_id "
+                "WHERE r.report_id = ?", (report_id,)
+            ).fetchall()
+            changed = False
+            for position, subject_id, file in subjects:
+                if not path.isfile(file):
+                    continue
+                current, _ = self._subject_id(file)
+                if current != subject_id:
+                    self._db.execute(
+                        "UPDATE report_subjects SET subject_id = ? "
+                        "WHERE report_id = ? AND position = ?",
+                        (current, report_id, position)
+                    )
+                    changed = True
+            return changed
+
+        settings = _load_yaml(settings_file)
+        if not isinstance(settings, dict):
+            msg = "Expect a mapping in settings {}"
+            raise ValueError(msg.format(settings_file))
+
+        date = _parse_date(settings.get("date"))
+        week = week_regime(date) if date else (None, None)
+        values = (
+            str(settings.get("format", "")),
+            str(settings.get("author", "")) if settings.get("author") else None
+        ) + tuple(d.isoformat() if d else None for d in (date,) + week)
+        if row is None:
+            report_id = self._db.execute(
+                "INSERT INTO reports "
+                "(path, format, author, date, week_start, week_end) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (settings_file,) + values
+            ).lastrowid
+        else:
+            report_id = row[0]
+            self._db.execute(
+                "UPDATE reports SET format = ?, author = ?, date = ?, "
+                "week_start = ?, week_end = ? WHERE id = ?",
+                values + (report_id,)
+            )
+
+        folder = path.dirname(settings_file)
+        self._db.execute(
+            "DELETE FROM report_subjects WHERE report_id = ?", (report_id,)
+        )
+        for position, sub in enumerate(settings.get("subjects") or []):
+            # one key per file, however the settings spell its path
+            subject_id, _ = self._subject_id(
+                path.normpath(path.join(folder, str(sub)))
+            )
+            self._db.execute(
+                "INSERT INTO report_subjects VALUES (?, ?, ?)",
+                (report_id, subject_id, position)
+            )
+        self._record(settings_file, stamp or self._stamp(settings_file))
+        return True
+
+    def update(self, settings_files):
+        """Index many settings files in one transaction
+
+        A file that fails to index, e.g. a missing subject or a broken
+        yaml, is left as it was and doesn't stop the others.
+
+        Returns:
+            (updated, errors), list of the settings files (re)indexed
+            and dict of settings file -> error of those that failed
+        """
+        updated, errors = [], {}
+        self._db.execute("BEGIN")
+        try:
+            for file in settings_files:
+                file = path.abspath(str(file))
+                self._db.execute("SAVEPOINT ingest")
+                try:
+                    if self.add(file):
+                        updated.append(file)
+                except Exception as e:
+                    self._db.execute("ROLLBACK TO ingest")
+                    errors[file] = "{}: {}".format(type(e).__name__, e)
+                self._db.execute("RELEASE ingest")
+            self._drop_unused_subjects()
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+        return updated, errors
+
+    def search(self, query=None, since=None, until=None, limit=50):
+        """Find subjects by text and/or by the week of their report
+
+        Args:
+            query: FTS5 query on subject titles, info, section names,
+                texts and picture captions, e.g. "lens AND calibration";
+                None to match every subject
+            since, until: datetime.date or "YYYY-MM-DD"; only reports
+                whose week overlaps the range are searched
+            limit: at most this many results
+
+        Returns:
+            list of dict with settings, date, format, author, title and
+            snippet, best matches first, then latest reports first
+        """
+        since, until = _parse_date(since), _parse_date(until)
+        where, params = [], []
+        if since is not None:
+            where.append("r.week_end >= ?")
+            params.append(since.isoformat())
+        if until is not None:
+            where.append("r.week_start <= ?")
+            params.append(until.isoformat())
+
+        order = ["r.date DESC", "rs.position"]
+        snippet = "substr(t.body, 1, 80)"
+        if query:
+            if self._fts:
+                where.append("subject_text MATCH ?")
+                params.append(query)
+                order.insert(0, "bm25(subject_text)")
+                snippet = (
+                    "snippet(subject_text, -1, '[', ']', '...', {})"
+                ).format(SNIPPET_WORDS)
+            else:
+                for term in query.split():
+                    where.append(
+                        "(t.title || ' ' || t.info || ' ' || t.body) LIKE ?"
+                    )
+                    params.append("%{}%".format(term))
+
+        sql = (
+            "SELECT r.path, r.date, r.format, r.author, s.title, {snippet} "
+            "FROM subject_text t "
+            "JOIN subjects s ON s.id = t.rowid "
+            "JOIN report_subjects rs ON rs.subject_id = s.id "
+            "JOIN reports r ON r.id = rs.report_id "
+            "{where} ORDER BY {order} LIMIT ?"
+        ).format(
+            snippet=snippet, order=", ".join(order),
+            where="WHERE " + " AND ".join(where) if where else ""
+        )
+        try:
+            rows = self._db.execute(sql, params + [limit]).fetchall()
+        except sqlite3.OperationalError as e:
+            msg = "Invalid search {!r}: {}"
+            raise ValueError(msg.format(query, e))
+
+        keys = ("settings", "date", "format", "author", "title", "snippet")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def report(self, settings_file):
+        """An archived report, as it was when last indexed
+
+        Returns:
+            dict with format, author, date and subjects, each subject a
+            dict with title, info and sections, as in the subject yaml
+        """
+        settings_file = path.abspath(str(settings_file))
+        row = self._db.execute(
+            "SELECT id, format, author, date FROM reports WHERE path = ?",
+            (settings_file,)
+        ).fetchone()
+        if row is None:
+            msg = "Not archived: {}"
+            raise KeyError(msg.format(settings_file))
+
+        subjects = self._db.execute(
+            "SELECT s.title, s.info, s.sections FROM report_subjects r "
+            "JOIN subjects s ON s.id = r.subject_id "
+            "WHERE r.report_id = ? ORDER BY r.position", (row[0],)
+        ).fetchall()
+        return {
+            "format": row[1],
+            "author": row[2],
+            "date": row[3],
+            "subjects": [
+                {"title": t, "info": i, "sections": json.loads(s)}
+                for t, i, s in subjects
+            ]
+        }
+
+
+if __name__ == "__main__":
+    pass
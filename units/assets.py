@@ -0,0 +1,133 @@
+import os
+import os.path as path
+import threading
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.parts.image import Image, ImagePart
+
+
+from . import _profile
+
+# units/data once installed, data/ of a source checkout otherwise
+DATADIR = path.join(path.dirname(path.abspath(__file__)), "data")
+if not path.isdir(DATADIR):
+    DATADIR = path.join(
+        path.dirname(path.dirname(path.abspath(__file__))), "data"
+    )
+
+
+def package_parts(package, kind):
+    """Image parts of one kind already added to package, by key
+
+    Kept on the package itself, so they go away with the presentation;
+    a map keyed by package would never let go of it, as every part
+    refers back to its package.
+    """
+    parts = getattr(package, "_ut_autoreport_parts", None)
+    if parts is None:
+        parts = {}
+        package._ut_autoreport_parts = parts
+    return parts.setdefault(kind, {})
+
+
+def add_picture_part(shapes, image_part, left, top, width=None, height=None):
+    """Add picture of an existing image part into given shapes
+
+    Same as shapes.add_picture, but skips reading and hashing the image
+    to look up its part, since the part is already known.
+    """
+    _profile.count("pictures placed")
+    rId = shapes.part.relate_to(image_part, RT.IMAGE)
+    pic = shapes._add_pic_from_image_part(
+        image_part, rId, left, top, width, height
+    )
+    shapes._recalculate_extents()
+    return shapes._shape_factory(pic)
+
+
+def add_blob_picture(shapes, picture, left, top, width=None, height=None):
+    """Add a picture loaded in memory into given shapes
+
+    Identical pictures share one part within a presentation, looked up
+    by the sha1 already known from loading; shapes.add_picture would hash
+    the image again, and every image already in the package, each time.
+    """
+    package = shapes.part.package
+    parts = package_parts(package, "blobs")
+    part = parts.get(picture.sha1)
+    if part is None:
+        image = Image(picture.blob, path.basename(picture.path or "image"))
+        part = ImagePart.new(package, image)
+        parts[picture.sha1] = part
+        _profile.count("images embedded")
+        _profile.count("bytes embedded", len(picture.blob))
+    return add_picture_part(shapes, part, left, top, width, height)
+
+
+class AssetRegistry:
+    """Banners and icons under data/, loaded once per process
+
+    Image bytes are read once and shared across presentations; within a
+    presentation the image part is created once and related to every
+    slide that shows it.
+    """
+
+    def __init__(self, folder=DATADIR):
+        self._folder = str(folder)
+        self._images = {}
+        self._lock = threading.Lock()
+
+    @property
+    def folder(self):
+        return self._folder
+
+    def names(self):
+        return sorted(
+            name for name in os.listdir(self._folder)
+            if path.isfile(path.join(self._folder, name))
+        )
+
+    def preload(self):
+        """Load every asset now, e.g. when a worker process starts"""
+        for name in self.names():
+            self.image(name)
+
+    def image(self, name):
+        """Get the pptx Image of an asset"""
+        with self._lock:
+            image = self._images.get(name)
+            if image is None:
+                file = path.join(self._folder, name)
+                if not path.isfile(file):
+                    msg = "No such asset: {}"
+                    raise ValueError(msg.format(name))
+                image = Image.from_file(file)
+                self._images[name] = image
+        return image
+
+    def blob(self, name):
+        return self.image(name).blob
+
+    def image_part(self, package, name):
+        """Get the image part of an asset within given package"""
+        image = self.image(name)
+        with self._lock:
+            parts = package_parts(package, "assets")
+            part = parts.get(name)
+            if part is None:
+                part = ImagePart.new(package, image)
+                parts[name] = part
+                _profile.count("images embedded")
+                _profile.count("bytes embedded", len(image.blob))
+        return part
+
+    def add_picture(self, shapes, name, left, top, width=None, height=None):
+        """Add an asset as picture into given shapes"""
+        part = self.image_part(shapes.part.package, name)
+        return add_picture_part(shapes, part, left, top, width, height)
+
+
+REGISTRY = AssetRegistry()
+
+
+if __name__ == "__main__":
+    pass
@@ -1,155 +1,198 @@
-import string
-import datetime
-import sys
-import os.path as path
-
-import pptx
-from pptx.util import Inches as Inch
-from pptx.util import Pt
-from pptx.dml.color import RGBColor
-from pptx.enum.text import PP_ALIGN, MSO_AUTO_SIZE
-from pptx.enum.shapes import MSO_CONNECTOR as Line
-
-
-REPORT_TITLE_LIMITS = 20
-SUBJECT_NUM_LIMITS = 3
-SUBJECT_TITLE_LIMITS = 35
-
-
-def week_regime(date):
-    last_monday = date - datetime.timedelta(days=date.weekday())
-    last_friday = last_monday + datetime.timedelta(days=4)
-    return last_monday, last_friday
-
-
-class ReportCover:
-
-    def __init__(self, header, titles, author, date):
-        self._w = 6.75
-        self._h = 3.23
-
-        self._titles = []
-        self._titles_font = "Times New Roman"
-        self.titles = titles
-
-        self._header = ""
-        self._header_font = "Arial"
-        self.header = header
-
-        self.author = author
-        start, end = week_regime(date)
-        self.date = (start, end)
-
-    @property
-    def titles(self):
-        return self._titles
-
-    @titles.setter
-    def titles(self, titles):
-        if isinstance(titles, str):
-            titles = [string.capwords(titles)]
-        else:
-            titles = [string.capwords(title) for title in titles]
-
-        if len(self.titles) > SUBJECT_NUM_LIMITS:
-            msg = "Cover: Can have at most {} subjects"
-            raise ValueError(msg.format(SUBJECT_NUM_LIMITS))
-        for text in self.titles:
-            if len(text) > SUBJECT_TITLE_LIMITS:
-                msg = "Subject can has at most {} characters."
-                raise ValueError(msg.format(SUBJECT_TITLE_LIMITS))
-
-        self._titles.extend(titles)
-
-    @property
-    def header(self):
-        return self._header
-
-    @header.setter
-    def header(self, value):
-        value = str(value).upper()
-        if len(value) > REPORT_TITLE_LIMITS:
-            msg = "Report title can has at most {} characters."
-            raise ValueError(msg.format(REPORT_TITLE_LIMITS))
-        self._header = value
-
-    @property
-    def w(self):
-        return self._w
-
-    @property
-    def h(self):
-        return self._h
-
-    def add_to_shapes(
-            self,
-            shapes,
-            left=0.0, top=0.0,
-            add_author_and_date=True
-            ):
-        """Add ReportCover into given shapes
-
-        Args:
-            shapes: the shapes refernce to add
-            left, top: specify the top-left corner of the object in Inch
-        """
-        left = Inch(left)
-        top = Inch(top)
-
-        textbox = shapes.add_textbox(
-            left=left, top=top,
-            height=Inch(self.h), width=Inch(self.w)
-            )
-        textbox.text_frame.word_wrap = True
-        textbox.text_frame.auto_size = MSO_AUTO_SIZE.SHAPE_TO_FIT_TEXT
-
-        param = textbox.text_frame.paragraphs[0]
-        param.alignment = PP_ALIGN.CENTER
-
-        # Cover Text
-        run = param.add_run()
-        run.text = self._header
-        font = run.font
-        font.name = self._header_font
-        font.size = Pt(54)
-        font.color.rgb = RGBColor(127, 127, 127)
-
-        # Draw a line under title
-        shapes.add_connector(
-            Line.STRAIGHT,
-            # x, y, x_end, y_end7
-            left+Inch(0.32), top+Inch(0.93), left+Inch(6.57), top+Inch(0.93)
-            )
-
-        for text in self.titles:
-            param = textbox.text_frame.add_paragraph()
-            param.space_before = Pt(6)
-            param.alignment = PP_ALIGN.CENTER
-            run = param.add_run()
-            run.text = text
-            font = run.font
-            font.name = self._titles_font
-            font.size = Pt(44)
-            font.color.rgb = RGBColor(127, 127, 127)
-
-        # Add author information
-        if add_author_and_date:
-            info = "Author - {}; Date - {} ~ {}"
-            textbox = shapes.add_textbox(
-                left=left - Inch(0.24),
-                top=top + Inch(3.91),
-                height=Inch(0.4), width=Inch(7.65)
-                )
-            param = textbox.text_frame.paragraphs[0]
-            param.alignment = PP_ALIGN.CENTER
-
-            run = param.add_run()
-            run.text = info.format(
-                self.author,
-                self.date[0],
-                self.date[1]
-                )
-            font = run.font
-            font.name = self._header_font
-            font.size = Pt(18)
-            font.color.rgb = RGBColor(84, 142, 213)
+import string
+import datetime
+import functools
+
+from ._templates import ShapeTemplate
+
+REPORT_TITLE_LIMITS = 20
+SUBJECT_NUM_LIMITS = 3
+SUBJECT_TITLE_LIMITS = 35
+TEXT_TITLE_LIMITS = 57
+
+
+def week_regime(date):
+    last_monday = date - datetime.timedelta(days=date.weekday())
+    last_friday = last_monday + datetime.timedelta(days=4)
+    return last_monday, last_friday
+
+
+def month_regime(date):
+    first_day = date.replace(day=1)
+    next_month = (first_day + datetime.timedelta(days=32)).replace(day=1)
+    return first_day, next_month - datetime.timedelta(days=1)
+
+
+def quarter_regime(date):
+    first_month = (date.month - 1) // 3 * 3 + 1
+    first_day = date.replace(month=first_month, day=1)
+    _, last_day = month_regime(first_day.replace(month=first_month + 2))
+    return first_day, last_day
+
+
+# report format -> the date range it covers, of a date within it
+REGIMES = {
+    "WeeklyReport": week_regime,
+    "MonthlyReport": month_regime,
+    "QuarterlyReport": quarter_regime,
+}
+# formats aggregating the weekly reports within their range
+ROLLUP_FORMATS = ("MonthlyReport", "QuarterlyReport")
+
+
+@functools.lru_cache(maxsize=None)
+def _cover_template(header_font, titles_font):
+    def draw(shapes):
+        from pptx.util import Pt
+        from pptx.dml.color import RGBColor
+        from pptx.enum.text import PP_ALIGN, MSO_AUTO_SIZE
+
+        textbox = shapes.add_textbox(0, 0, 0, 0)
+        textbox.text_frame.word_wrap = True
+        textbox.text_frame.auto_size = MSO_AUTO_SIZE.SHAPE_TO_FIT_TEXT
+
+        param = textbox.text_frame.paragraphs[0]
+        param.alignment = PP_ALIGN.CENTER
+
+        # Cover Text
+        run = param.add_run()
+        font = run.font
+        font.name = header_font
+        font.size = Pt(54)
+        font.color.rgb = RGBColor(127, 127, 127)
+
+        # a paragraph per title
+        param = textbox.text_frame.add_paragraph()
+        param.space_before = Pt(6)
+        param.alignment = PP_ALIGN.CENTER
+        run = param.add_run()
+        font = run.font
+        font.name = titles_font
+        font.size = Pt(44)
+        font.color.rgb = RGBColor(127, 127, 127)
+        return textbox
+    return ShapeTemplate(draw)
+
+
+@functools.lru_cache(maxsize=None)
+def _author_template(font):
+    def draw(shapes):
+        from pptx.util import Pt
+        from pptx.dml.color import RGBColor
+        from pptx.enum.text import PP_ALIGN
+
+        textbox = shapes.add_textbox(0, 0, 0, 0)
+        param = textbox.text_frame.paragraphs[0]
+        param.alignment = PP_ALIGN.CENTER
+
+        run = param.add_run()
+        font_ = run.font
+        font_.name = font
+        font_.size = Pt(18)
+        font_.color.rgb = RGBColor(84, 142, 213)
+        return textbox
+    return ShapeTemplate(draw)
+
+
+class ReportCover:
+
+    def __init__(self, header, titles, author, date, regime=week_regime):
+        self._w = 6.75
+        self._h = 3.23
+
+        self._titles = []
+        self._titles_font = "Times New Roman"
+        self.titles = titles
+
+        self._header = ""
+        self._header_font = "Arial"
+        self.header = header
+
+        self.author = author
+        start, end = regime(date)
+        self.date = (start, end)
+
+    @property
+    def titles(self):
+        return self._titles
+
+    @titles.setter
+    def titles(self, titles):
+        if isinstance(titles, str):
+            titles = [string.capwords(titles)]
+        else:
+            titles = [string.capwords(title) for title in titles]
+
+        if len(self._titles) + len(titles) > SUBJECT_NUM_LIMITS:
+            msg = "Cover: Can have at most {} subjects"
+            raise ValueError(msg.format(SUBJECT_NUM_LIMITS))
+        for text in titles:
+            if len(text) > SUBJECT_TITLE_LIMITS:
+                msg = "Subject can has at most {} characters."
+                raise ValueError(msg.format(SUBJECT_TITLE_LIMITS))
+
+        self._titles.extend(titles)
+
+    @property
+    def header(self):
+        return self._header
+
+    @header.setter
+    def header(self, value):
+        value = str(value).upper()
+        if len(value) > REPORT_TITLE_LIMITS:
+            msg = "Report title can has at most {} characters."
+            raise ValueError(msg.format(REPORT_TITLE_LIMITS))
+        self._header = value
+
+    @property
+    def w(self):
+        return self._w
+
+    @property
+    def h(self):
+        return self._h
+
+    def add_to_shapes(
+            self,
+            shapes,
+            left=0.0, top=0.0,
+            add_author_and_date=True
+            ):
+        """Add ReportCover into given shapes
+
+        Args:
+            shapes: the shapes refernce to add
+            left, top: specify the top-left corner of the object in Inch
+        """
+        # imported here, so limits and week_regime don't pull in pptx
+        from pptx.util import Inches as Inch
+        from pptx.enum.shapes import MSO_CONNECTOR as Line
+
+        left = Inch(left)
+        top = Inch(top)
+
+        # Cover Text, with the titles under it
+        _cover_template(self._header_font, self._titles_font).add_to_shapes(
+            shapes,
+            left=left, top=top,
+            width=Inch(self.w), height=Inch(self.h),
+            texts=[self._header, self.titles]
+            )
+
+        # Draw a line under title
+        shapes.add_connector(
+            Line.STRAIGHT,
+            # x, y, x_end, y_end7
+            left+Inch(0.32), top+Inch(0.93), left+Inch(6.57), top+Inch(0.93)
+            )
+
+        # Add author information
+        if add_author_and_date:
+            info = "Author - {}; Date - {} ~ {}"
+            _author_template(self._header_font).add_to_shapes(
+                shapes,
+                left=left - Inch(0.24),
+                top=top + Inch(3.91),
+                width=Inch(7.65), height=Inch(0.4),
+                texts=[info.format(self.author, self.date[0], self.date[1])]
+                )
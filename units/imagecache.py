@@ -0,0 +1,161 @@
+import os
+import os.path as path
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+from . import _profile
+from ._utils import atomic_write
+
+CACHE_FILENAME = ".ut_autoreport_cache.json"
+CACHE_VERSION = 1
+MAX_ENTRIES = 4096
+
+
+def file_sha1(file, chunk_size=1 << 20):
+    sha1 = hashlib.sha1()
+    with open(str(file), "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+class ImageCache:
+    """On-disk image metadata, so re-runs only stat the pictures
+
+    Entries are keyed by absolute path and validated against mtime and
+    file size; a stale or missing entry is re-hashed, and re-probed only
+    if no other entry has the same content. Least recently used entries
+    are evicted beyond max_entries.
+    """
+
+    def __init__(self, file=None, max_entries=MAX_ENTRIES):
+        self._file = str(file) if file is not None else None
+        self._max = int(max_entries)
+        self._entries = OrderedDict()
+        # sha1 -> a key of an entry with that content
+        self._contents = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+
+        if self._file is not None and path.isfile(self._file):
+            self._load()
+
+    @classmethod
+    def beside(cls, file, **kwargs):
+        """Create cache stored in the same directory as given file"""
+        folder = path.dirname(path.abspath(str(file)))
+        return cls(path.join(folder, CACHE_FILENAME), **kwargs)
+
+    @property
+    def file(self):
+        return self._file
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _load(self):
+        try:
+            with open(self._file, "r") as f:
+                content = json.load(f)
+        except (OSError, ValueError):
+            # a broken cache is just an empty cache
+            return
+
+        if content.get("version") != CACHE_VERSION:
+            return
+        for key, entry in content.get("entries", []):
+            self._entries[key] = entry
+            self._contents[entry["sha1"]] = key
+
+    def lookup(self, img_path):
+        """Get metadata of an image if cached and up to date, else None"""
+        key = path.abspath(str(img_path))
+        stat = os.stat(key)
+        with self._lock:
+            return self._lookup(key, stat)
+
+    def _lookup(self, key, stat):
+        entry = self._entries.get(key)
+        if entry is not None \
+                and entry["mtime"] == stat.st_mtime_ns \
+                and entry["size"] == stat.st_size:
+            if next(reversed(self._entries)) != key:
+                # recency is saved too, so eviction is LRU across runs
+                self._entries.move_to_end(key)
+                self._dirty = True
+            return entry
+        return None
+
+    def get(self, img_path, probe, blob=None):
+        """Get metadata of an image, probing it only when needed
+
+        Args:
+            img_path: path to the image
+            probe: callable(img_path) -> (height, width, format) in pixels
+            blob: content of the image, if already read, to hash from
+
+        Returns:
+            dict with height, width, format and sha1 of the image
+        """
+        key = path.abspath(str(img_path))
+        stat = os.stat(key)
+
+        with self._lock:
+            entry = self._lookup(key, stat)
+        if entry is not None:
+            _profile.count("image cache hits")
+            return entry
+        _profile.count("image cache misses")
+
+        if blob is not None:
+            sha1 = hashlib.sha1(blob).hexdigest()
+        else:
+            sha1 = file_sha1(key)
+
+        # a copy of an already probed image, e.g. under another name
+        with self._lock:
+            same = self._entries.get(self._contents.get(sha1))
+        if same is not None and same["sha1"] == sha1:
+            height, width, fmt = same["height"], same["width"], same["format"]
+        else:
+            height, width, fmt = probe(key)
+
+        entry = {
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "height": height,
+            "width": width,
+            "format": fmt,
+            "sha1": sha1
+        }
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._contents[sha1] = key
+            while len(self._entries) > self._max:
+                self._entries.popitem(last=False)
+            self._dirty = True
+        return entry
+
+    def save(self):
+        """Write cache back to disk if anything changed"""
+        if self._file is None or not self._dirty:
+            return
+
+        with self._lock:
+            content = {
+                "version": CACHE_VERSION,
+                "entries": list(self._entries.items())
+            }
+            self._dirty = False
+
+        with atomic_write(self._file) as f:
+            json.dump(content, f)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,91 @@
+def paginate(blocks, first_top, top, bottom):
+    """Break a column of blocks into pages, in one pass
+
+    Blocks are stacked top-down in order; when the next one doesn't fit
+    above bottom, a new page is started at top. A block taller than a
+    whole page is put on a page of its own.
+
+    Args:
+        blocks: sequence of (height, gap), gap being the space above it
+        first_top: where the first page starts, in Inch
+        top: where the following pages start, in Inch
+        bottom: lower limit of every page, in Inch
+
+    Returns:
+        list of pages, each a list of (index of block, top of block)
+    """
+    pages = [[]]
+    cursor = first_top
+    for index, (height, gap) in enumerate(blocks):
+        if cursor + gap + height > bottom and pages[-1]:
+            pages.append([])
+            cursor = top
+        pages[-1].append((index, cursor + gap))
+        cursor += gap + height
+    return pages
+
+
+def pack_shelves(widths, width, spacing):
+    """Pack blocks left to right into rows (shelves) of given width
+
+    Next-fit in the given order, so reading order is kept: a new shelf
+    starts when the next block doesn't fit on the current one.
+
+    Args:
+        widths: widths of blocks, in Inch
+        width: available width of a shelf, in Inch
+        spacing: horizontal space between blocks, in Inch
+
+    Returns:
+        list of shelves, each a list of (index of block, left offset)
+    """
+    shelves = [[]]
+    cursor = 0.0
+    for index, w in enumerate(widths):
+        if shelves[-1] and cursor + spacing + w > width:
+            shelves.append([])
+            cursor = 0.0
+        if shelves[-1]:
+            cursor += spacing
+        shelves[-1].append((index, cursor))
+        cursor += w
+    return [shelf for shelf in shelves if shelf]
+
+
+class Shelf:
+    """A row of units laid out side by side, usable as a single unit"""
+
+    def __init__(self, units, offsets):
+        self._units = list(units)
+        self._offsets = list(offsets)
+        self._h = max(unit.h for unit in self._units)
+        self._w = max(
+            offset + unit.w
+            for unit, offset in zip(self._units, self._offsets)
+        )
+
+    @property
+    def h(self):
+        return self._h
+
+    @property
+    def w(self):
+        return self._w
+
+    @property
+    def units(self):
+        return self._units
+
+    def add_to_shapes(self, shapes, left=0.0, top=0.0):
+        """Add every unit of the shelf into given shapes
+
+        Args:
+            shapes: the shape refernce to add
+            left, top: specify the top-left corner of the shelf in Inch
+        """
+        for unit, offset in zip(self._units, self._offsets):
+            unit.add_to_shapes(shapes, left=left + offset, top=top)
+
+
+if __name__ == "__main__":
+    pass
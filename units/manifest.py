@@ -0,0 +1,107 @@
+import os
+import os.path as path
+import json
+
+from ._utils import atomic_write
+from .imagecache import file_sha1
+from .pictures import probe_image
+
+MANIFEST_PATTERN = ".{}.manifest.json"
+MANIFEST_VERSION = 1
+
+
+def fingerprint(settings_file, subject_files, picture_files,
+                cache=None, options=None):
+    """Content hashes of everything a report is built from
+
+    Args:
+        settings_file: path of the settings yaml
+        subject_files: paths of the subject yamls
+        picture_files: paths of all referenced pictures
+        cache: optional ImageCache, so unchanged pictures are only stat-ed
+        options: extra json-able build options that affect the output
+
+    Returns:
+        dict, equal for two builds iff their inputs are the same
+    """
+    pictures = {}
+    for pic in picture_files:
+        pic = path.abspath(str(pic))
+        if pic in pictures:
+            continue
+        if cache is not None:
+            pictures[pic] = cache.get(pic, probe=probe_image)["sha1"]
+        else:
+            pictures[pic] = file_sha1(pic)
+
+    subjects = {}
+    for sub in subject_files:
+        sub = path.abspath(str(sub))
+        if sub not in subjects:
+            subjects[sub] = file_sha1(sub)
+
+    return {
+        "settings": file_sha1(settings_file),
+        "subjects": subjects,
+        "pictures": pictures,
+        "options": options or {}
+    }
+
+
+class BuildManifest:
+    """Record of the inputs an output file was last built from
+
+    Stored as a hidden json file next to the output, one per output, so
+    parallel builds into the same directory don't race on it. A report
+    whose fingerprint matches the record, and whose output is untouched
+    since, doesn't need to be rebuilt.
+    """
+
+    def __init__(self, out_file):
+        self._out = path.abspath(str(out_file))
+        folder, name = path.split(self._out)
+        self._file = path.join(folder, MANIFEST_PATTERN.format(name))
+        self._record = None
+
+        if path.isfile(self._file):
+            try:
+                with open(self._file, "r") as f:
+                    content = json.load(f)
+            except (OSError, ValueError):
+                content = {}
+            if content.get("version") == MANIFEST_VERSION:
+                self._record = content
+
+    @property
+    def file(self):
+        return self._file
+
+    @property
+    def output(self):
+        return self._out
+
+    def is_current(self, fingerprint):
+        if self._record is None or not path.isfile(self._out):
+            return False
+
+        stat = os.stat(self._out)
+        return self._record["fingerprint"] == fingerprint \
+            and self._record["mtime"] == stat.st_mtime_ns \
+            and self._record["size"] == stat.st_size
+
+    def record(self, fingerprint):
+        """Record output as freshly built from given fingerprint"""
+        stat = os.stat(self._out)
+        self._record = {
+            "version": MANIFEST_VERSION,
+            "fingerprint": fingerprint,
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size
+        }
+
+        with atomic_write(self._file) as f:
+            json.dump(self._record, f)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,320 @@
+import os
+import os.path as path
+import io
+import hashlib
+from collections import namedtuple
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ._utils import image_size, atomic_write
+from . import _profile
+from .imagecache import file_sha1
+
+Picture = namedtuple(
+    "Picture",
+    ["path", "blob", "height", "width", "format", "sha1"]
+)
+
+MAX_WORKERS = 16
+RESAMPLE_DIRNAME = ".ut_autoreport_images"
+
+# formats kept lossless on re-encode, everything else is treated as photo
+_LOSSLESS = ("png", "gif", "bmp", "tiff")
+
+
+def probe_image(img_path):
+    """Get (height, width, format) of an image in pixels"""
+    _profile.count("images probed")
+    shape = image_size(img_path)
+    if shape is not None:
+        return shape
+
+    # header not recognized, fallback to a full decode
+    import cv2
+    img = cv2.imread(str(img_path))
+    if img is None:
+        msg = "Failed to load image: {}"
+        raise ValueError(msg.format(img_path))
+    height, width = img.shape[:2]
+    return height, width, None
+
+
+def load_picture(img_path, cache=None, keep_blob=True):
+    """Read an image into memory together with its metadata
+
+    Args:
+        img_path: path to the image
+        cache: optional ImageCache to look up the metadata in
+        keep_blob: if False, only metadata is kept and Picture.blob is
+            None; the image is then embedded straight from its file
+
+    Returns:
+        Picture, with height and width in pixels
+    """
+    img_path = path.abspath(str(img_path))
+    _profile.count("images loaded")
+    blob = None
+    if keep_blob:
+        with open(img_path, "rb") as f:
+            blob = f.read()
+        _profile.count("bytes read", len(blob))
+
+    if cache is not None:
+        entry = cache.get(img_path, probe=probe_image, blob=blob)
+        height, width = entry["height"], entry["width"]
+        fmt, sha1 = entry["format"], entry["sha1"]
+    else:
+        height, width, fmt = probe_image(img_path)
+        if blob is not None:
+            sha1 = hashlib.sha1(blob).hexdigest()
+        else:
+            sha1 = file_sha1(img_path)
+
+    return Picture(img_path, blob, height, width, fmt, sha1)
+
+
+def read_blob(picture):
+    """Content of a picture, from memory or its file"""
+    if picture.blob is not None:
+        return picture.blob
+    with open(picture.path, "rb") as f:
+        return f.read()
+
+
+def _stat_key(img_path):
+    stat = os.stat(img_path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _file_key(img_path):
+    # same for every path to one file: symlinks, hard links, "a/../b"
+    stat = os.stat(img_path)
+    return stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class PictureStore:
+    """Pictures keyed by content, so identical images are loaded once
+
+    Paths to the same file are recognized by stat, copies of an image by
+    sha1; either way one shared Picture is returned, whose bytes are kept
+    in memory once and which is resampled and embedded once. When the
+    cache already knows the sha1 of a copy, the copy isn't even read.
+    """
+
+    def __init__(self, cache=None, keep_blob=True):
+        self._cache = cache
+        self._keep_blob = keep_blob
+        self._files = {}
+        self._contents = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._contents)
+
+    def get(self, img_path):
+        """Get the shared Picture of an image"""
+        key = _file_key(img_path)
+        with self._lock:
+            picture = self._files.get(key)
+        if picture is not None:
+            return picture
+
+        if self._cache is not None:
+            entry = self._cache.lookup(img_path)
+            with self._lock:
+                picture = self._contents.get(entry and entry["sha1"])
+        if picture is None:
+            picture = load_picture(
+                img_path, cache=self._cache, keep_blob=self._keep_blob
+            )
+
+        with self._lock:
+            picture = self._contents.setdefault(picture.sha1, picture)
+            self._files[key] = picture
+        return picture
+
+
+def prepare_pictures(img_paths, cache=None, workers=None, memo=None,
+                     keep_blob=True, store=None):
+    """Load, probe and hash many images concurrently
+
+    Reading and hashing are I/O bound and release the GIL, so a thread
+    pool hides most of the latency of slow network mounts.
+
+    Args:
+        img_paths: paths of the images
+        cache: optional ImageCache to look up the metadata in
+        workers: number of threads
+        memo: optional dict kept by the caller across calls, keyed by
+            absolute path; pictures unchanged since the last call are
+            taken from it, not re-read
+        keep_blob: if False, only metadata is loaded, see load_picture
+        store: optional PictureStore to share pictures across calls;
+            identical images are loaded once either way
+
+    Returns:
+        dict mapping each given path to its Picture, paths to identical
+        images share one Picture
+    """
+    img_paths = list(dict.fromkeys(str(p) for p in img_paths))
+    if not img_paths:
+        return {}
+    if store is None:
+        store = PictureStore(cache=cache, keep_blob=keep_blob)
+
+    # one path per file, so paths to one file aren't loaded concurrently
+    files = {}
+    for img_path in img_paths:
+        files.setdefault(_file_key(img_path), img_path)
+    unique = list(files.values())
+
+    def load(img_path):
+        if memo is None:
+            return store.get(img_path)
+
+        key = _stat_key(img_path), keep_blob
+        hit = memo.get(path.abspath(img_path))
+        if hit is not None and hit[0] == key:
+            return hit[1]
+        picture = store.get(img_path)
+        memo[path.abspath(img_path)] = (key, picture)
+        return picture
+
+    if workers is None:
+        workers = min(MAX_WORKERS, (os.cpu_count() or 1) * 4)
+    workers = max(1, min(workers, len(unique)))
+
+    with _profile.phase("pictures"):
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(load, unique))
+        return {img_path: load(img_path) for img_path in img_paths}
+
+
+class Resampler:
+    """Downscale and re-encode pictures to the size they are shown at
+
+    Pictures are resampled to fit their target box at given dpi; PNG and
+    other lossless sources stay PNG, photos become JPEG of given quality.
+    Results are cached by (source sha1, target size, dpi, quality), in
+    memory and optionally under cache_dir.
+    """
+
+    def __init__(self, dpi=150, quality=85, cache_dir=None):
+        self._dpi = int(dpi)
+        self._quality = int(quality)
+        if self._dpi <= 0:
+            msg = "dpi must be positive, got {}"
+            raise ValueError(msg.format(dpi))
+        if not 1 <= self._quality <= 95:
+            msg = "quality must be within 1 ~ 95, got {}"
+            raise ValueError(msg.format(quality))
+
+        self._dir = str(cache_dir) if cache_dir is not None else None
+        self._memo = {}
+
+    @classmethod
+    def beside(cls, file, **kwargs):
+        """Create resampler caching under the directory of given file"""
+        folder = path.dirname(path.abspath(str(file)))
+        return cls(cache_dir=path.join(folder, RESAMPLE_DIRNAME), **kwargs)
+
+    @property
+    def dpi(self):
+        return self._dpi
+
+    @property
+    def quality(self):
+        return self._quality
+
+    def fit(self, picture, box):
+        """Get picture resampled to fit box
+
+        Args:
+            picture: the source Picture
+            box: (height, width) of displayed picture in Inch
+
+        Returns:
+            a Picture, the source itself if it is already small enough;
+            a resampled picture only has a path if it is cached on disk,
+            and only has a blob if the source has one or it isn't cached
+        """
+        target_h = max(1, int(round(box[0] * self._dpi)))
+        target_w = max(1, int(round(box[1] * self._dpi)))
+        if picture.height <= target_h and picture.width <= target_w:
+            return picture
+        if picture.format is None:
+            return picture
+
+        ext = "png" if picture.format in _LOSSLESS else "jpg"
+        name = "{}_{}x{}_{}dpi_q{}.{}".format(
+            picture.sha1, target_w, target_h,
+            self._dpi, self._quality, ext
+        )
+        if name in self._memo:
+            return self._memo[name]
+
+        cached = path.join(self._dir, name) if self._dir else None
+        # pictures streamed from their files stay on disk once resampled
+        streamed = picture.blob is None and cached is not None
+        if cached is not None and path.isfile(cached):
+            blob = None
+            if not streamed:
+                with open(cached, "rb") as f:
+                    blob = f.read()
+        else:
+            with _profile.phase("resample"):
+                blob = self._encode(picture, (target_w, target_h), ext)
+            _profile.count("images resampled")
+            if cached is not None:
+                os.makedirs(self._dir, exist_ok=True)
+                with atomic_write(cached, "wb") as f:
+                    f.write(blob)
+
+        if picture.blob is not None:
+            source_size = len(picture.blob)
+        else:
+            source_size = os.path.getsize(picture.path)
+
+        if blob is not None:
+            size = len(blob)
+        else:
+            size = os.path.getsize(cached)
+
+        if size >= source_size:
+            # re-encoding didn't pay off, keep the original
+            resampled = picture
+        elif blob is None:
+            height, width, fmt = image_size(cached)
+            resampled = Picture(
+                cached, None, height, width, fmt, file_sha1(cached)
+            )
+        else:
+            height, width, fmt = image_size(io.BytesIO(blob))
+            resampled = Picture(
+                cached, None if streamed else blob, height, width, fmt,
+                hashlib.sha1(blob).hexdigest()
+            )
+        self._memo[name] = resampled
+        return resampled
+
+    def _encode(self, picture, size, ext):
+        from PIL import Image
+
+        img = Image.open(io.BytesIO(read_blob(picture)))
+        img.thumbnail(size, Image.LANCZOS)
+
+        out = io.BytesIO()
+        if ext == "png":
+            img.save(out, format="PNG", optimize=True)
+        else:
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            img.save(
+                out, format="JPEG",
+                quality=self._quality, optimize=True, progressive=True
+            )
+        return out.getvalue()
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,190 @@
+import os.path as path
+import glob
+import json
+from datetime import datetime as dt
+
+# orjson parses several times faster, fallback to json if missing
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def load_json(file):
+    """Load a .json file, with orjson if it's installed"""
+    if orjson is not None:
+        with open(str(file), "rb") as f:
+            return orjson.loads(f.read())
+    with open(str(file), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def find_json(sources):
+    """Expand files, directories and glob patterns into .json files
+
+    Directories are searched recursively. Files are returned sorted and
+    each only once.
+    """
+    found = {}
+    for source in sources:
+        source = str(source)
+        if path.isdir(source):
+            pattern = path.join(source, "**", "*.json")
+            candidates = glob.glob(pattern, recursive=True)
+        else:
+            candidates = glob.glob(source, recursive=True)
+
+        for file in sorted(candidates):
+            found.setdefault(path.abspath(file), None)
+    return list(found)
+
+
+def _parse_date(date, file):
+    if date is None:
+        return None
+    try:
+        return dt.strptime(str(date), "%Y-%m-%d").date()
+    except ValueError:
+        msg = "Invalid date {} in {}, must be YYYY-MM-DD"
+        raise ValueError(msg.format(date, file))
+
+
+class ProgressIndex:
+    """Projects and their Progress, merged from many .json files
+
+    Every file may declare Projects and/or describe Progress of any
+    Project, e.g.:
+
+        {
+            "projects": [{"name": "Foo", "info": "about foo"}],
+            "progress": [{
+                "project": "Foo", "date": "2018-05-01",
+                "section": "section name", "text": "...",
+                "picture": {"name": "...", "path": "...",
+                            "description": "..."}
+            }]
+        }
+
+    Progress is indexed by Project name as files are added, so merging
+    is a single pass over the entries; each Project's Progress is sorted
+    by date, then by the order it's read, once when it's asked for.
+    """
+
+    def __init__(self):
+        # name -> info, in order of declaration
+        self._projects = {}
+        # name -> [(sort key, entry)]
+        self._progress = {}
+        self._unsorted = set()
+        self._files = []
+        self._count = 0
+
+    @property
+    def files(self):
+        return self._files
+
+    @property
+    def projects(self):
+        """Names of declared Projects, in order of declaration"""
+        return list(self._projects)
+
+    def info(self, project):
+        return self._projects[project]
+
+    def add_file(self, file):
+        file = path.abspath(str(file))
+        content = load_json(file)
+        if not isinstance(content, dict):
+            msg = "Expect a json object in {}"
+            raise ValueError(msg.format(file))
+
+        self.add(content, folder=path.dirname(file), file=file)
+        self._files.append(file)
+
+    def add(self, content, folder=None, file=None):
+        """Add Projects and Progress of one parsed .json content
+
+        Args:
+            content: dict with optional "projects" and "progress" lists
+            folder: relative picture paths are resolved against it
+            file: where the content comes from, for error messages
+        """
+        for project in content.get("projects", []):
+            if isinstance(project, str):
+                project = {"name": project}
+            name = str(project["name"])
+            info = project.get("info")
+            if not self._projects.get(name):
+                self._projects[name] = info
+
+        for entry in content.get("progress", []):
+            name = str(entry["project"])
+            date = _parse_date(entry.get("date"), file)
+
+            items = []
+            if entry.get("text"):
+                items.append({"text": str(entry["text"])})
+            if entry.get("picture"):
+                pic = entry["picture"]
+                pic = {
+                    "name": str(pic.get("name", "")),
+                    "path": str(pic["path"]),
+                    "description": str(pic.get("description", ""))
+                }
+                if folder is not None:
+                    pic["path"] = path.join(folder, pic["path"])
+                items.append({"picture": pic})
+            if not items:
+                msg = "Progress of {} in {} must have text and/or picture"
+                raise ValueError(msg.format(name, file))
+
+            section = entry.get("section")
+            if section is None:
+                section = date.isoformat() if date else name
+
+            # undated progress goes after the dated ones
+            key = (date is None, date or dt.min.date(), self._count)
+            self._count += 1
+            self._progress.setdefault(name, []).append(
+                (key, {"date": date, "section": str(section), "items": items})
+            )
+            self._unsorted.add(name)
+
+    def check(self):
+        """Raise if any Progress relates to an undeclared Project"""
+        undeclared = [n for n in self._progress if n not in self._projects]
+        if undeclared:
+            msg = "Progress of undeclared projects: {}"
+            raise ValueError(msg.format(undeclared))
+
+    def progress(self, project):
+        """Progress of a Project, sorted by date
+
+        Returns:
+            list of dict, each with date, section and items
+        """
+        entries = self._progress.get(project, [])
+        if project in self._unsorted:
+            entries.sort(key=lambda e: e[0])
+            self._unsorted.discard(project)
+        return [entry for _key, entry in entries]
+
+    def sections(self, project):
+        """Progress of a Project, in the sections format of a subject"""
+        return [
+            {entry["section"]: entry["items"]}
+            for entry in self.progress(project)
+        ]
+
+    @classmethod
+    def from_sources(cls, sources):
+        """Build index from files, directories and/or glob patterns"""
+        index = cls()
+        for file in find_json(sources):
+            index.add_file(file)
+        index.check()
+        return index
+
+
+if __name__ == "__main__":
+    pass
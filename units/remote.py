@@ -0,0 +1,394 @@
+import os
+import os.path as path
+import json
+import time
+import hashlib
+import tempfile
+import threading
+import collections
+from urllib.parse import urlsplit
+from urllib.request import url2pathname
+from concurrent.futures import ThreadPoolExecutor
+
+from ._utils import atomic_write, replace_file, temp_name
+
+REMOTE_DIRNAME = ".ut_autoreport_remote"
+INDEX_NAME = "index.json"
+MAX_BYTES = 50 * 2 ** 20
+TIMEOUT = 30.0
+CONNECTIONS = 16
+# pictures fetched this long ago are used without asking the server again,
+# e.g. between --validate and the render right after it
+FRESH_SECONDS = 60.0
+CHUNK_SIZE = 1 << 16
+
+_REMOTE_SCHEMES = ("http", "https")
+
+
+class FetchError(OSError):
+    """Raised when a remote picture can't be fetched"""
+
+
+def is_uri(img_path):
+    """Whether a picture path is an http(s):// or file:// URI"""
+    scheme = urlsplit(str(img_path)).scheme.lower()
+    return scheme in _REMOTE_SCHEMES or scheme == "file"
+
+
+def _file_path(uri):
+    parts = urlsplit(uri)
+    if parts.netloc not in ("", "localhost"):
+        # file://server/share/pic.png, a UNC path on Windows
+        return url2pathname("//" + parts.netloc + parts.path)
+    return url2pathname(parts.path)
+
+
+class RemoteCache:
+    """Fetched pictures on disk, with what's needed to revalidate them
+
+    Every URL is stored once, named by the sha1 of the URL, along with
+    its ETag and Last-Modified; refetching sends them back, so unchanged
+    pictures are answered 304 without their bytes.
+
+    Args:
+        folder: where the pictures and index.json are kept
+    """
+
+    # (folder, url) -> time it was last fetched or revalidated, oldest
+    # first; entries past FRESH_SECONDS are dropped as new ones come in
+    _fresh = collections.OrderedDict()
+    _fresh_lock = threading.Lock()
+
+    def __init__(self, folder):
+        self._dir = str(folder)
+        self._file = path.join(self._dir, INDEX_NAME)
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._dirty = False
+
+        if path.isfile(self._file):
+            try:
+                with open(self._file, "r") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+
+    @classmethod
+    def beside(cls, file):
+        """Create cache under the directory of given file"""
+        folder = path.dirname(path.abspath(str(file)))
+        return cls(path.join(folder, REMOTE_DIRNAME))
+
+    @classmethod
+    def in_tempdir(cls):
+        """Create cache shared by everything not rendered from a file"""
+        return cls(path.join(tempfile.gettempdir(), REMOTE_DIRNAME))
+
+    @property
+    def folder(self):
+        return self._dir
+
+    def local_path(self, url):
+        """Path of the cached copy of url, None if there is none"""
+        with self._lock:
+            entry = self._entries.get(url)
+        if entry is None:
+            return None
+        local = path.join(self._dir, entry["file"])
+        return local if path.isfile(local) else None
+
+    def is_fresh(self, url):
+        with self._fresh_lock:
+            fetched = self._fresh.get((self._dir, url))
+        return fetched is not None and time.time() - fetched < FRESH_SECONDS \
+            and self.local_path(url) is not None
+
+    def validators(self, url):
+        """Conditional request headers for url, empty if not cached"""
+        if self.local_path(url) is None:
+            return {}
+        with self._lock:
+            entry = self._entries[url]
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def revalidated(self, url):
+        now = time.time()
+        with self._fresh_lock:
+            fresh = self._fresh
+            fresh[(self._dir, url)] = now
+            fresh.move_to_end((self._dir, url))
+            while now - next(iter(fresh.values())) >= FRESH_SECONDS:
+                fresh.popitem(last=False)
+        return self.local_path(url)
+
+    def open_new(self, url):
+        """Open a temporary file to write the fetched bytes of url into"""
+        os.makedirs(self._dir, exist_ok=True)
+        name = hashlib.sha1(url.encode()).hexdigest()
+        ext = path.splitext(urlsplit(url).path)[1].lower()[:8]
+        tmp = temp_name(path.join(self._dir, name + ext))
+        return name + ext, tmp, open(tmp, "wb")
+
+    def commit(self, url, name, tmp, etag=None, last_modified=None):
+        """Move a fully written temporary file in place of url's copy"""
+        replace_file(tmp, path.join(self._dir, name))
+        with self._lock:
+            self._entries[url] = {
+                "file": name, "etag": etag, "last_modified": last_modified
+            }
+            self._dirty = True
+        return self.revalidated(url)
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = dict(self._entries)
+            self._dirty = False
+        os.makedirs(self._dir, exist_ok=True)
+        with atomic_write(self._file) as f:
+            json.dump(entries, f)
+
+
+def _too_large(url, max_bytes):
+    msg = "{} is larger than {} bytes"
+    return FetchError(msg.format(url, max_bytes))
+
+
+async def _fetch_aiohttp(session, url, cache, max_bytes):
+    headers = cache.validators(url)
+    async with session.get(url, headers=headers) as resp:
+        if resp.status == 304 and headers:
+            return cache.revalidated(url)
+        if resp.status != 200:
+            msg = "{} answered HTTP {} {}"
+            raise FetchError(msg.format(url, resp.status, resp.reason))
+        if (resp.content_length or 0) > max_bytes:
+            raise _too_large(url, max_bytes)
+
+        name, tmp, f = cache.open_new(url)
+        size = 0
+        try:
+            with f:
+                async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise _too_large(url, max_bytes)
+                    f.write(chunk)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        return cache.commit(
+            url, name, tmp,
+            resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+        )
+
+
+class _Connections(threading.local):
+    """Keep-alive http.client connections, per thread and per host"""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.pool = {}
+
+    def get(self, parts):
+        import http.client
+
+        key = (parts.scheme, parts.netloc)
+        conn = self.pool.get(key)
+        if conn is None:
+            if parts.scheme == "https":
+                conn = http.client.HTTPSConnection(
+                    parts.netloc, timeout=self.timeout
+                )
+            else:
+                conn = http.client.HTTPConnection(
+                    parts.netloc, timeout=self.timeout
+                )
+            self.pool[key] = conn
+        return conn
+
+    def drop(self, parts):
+        conn = self.pool.pop((parts.scheme, parts.netloc), None)
+        if conn is not None:
+            conn.close()
+
+
+def _fetch_http_client(connections, url, cache, max_bytes):
+    import http.client
+
+    parts = urlsplit(url)
+    target = parts.path or "/"
+    if parts.query:
+        target += "?" + parts.query
+    headers = cache.validators(url)
+
+    for attempt in (1, 2):
+        conn = connections.get(parts)
+        try:
+            conn.request("GET", target, headers=headers)
+            resp = conn.getresponse()
+            break
+        except (http.client.RemoteDisconnected, ConnectionResetError,
+                BrokenPipeError):
+            # the server closed a kept-alive connection, retry on a new one
+            connections.drop(parts)
+            if attempt == 2:
+                raise
+
+    try:
+        if resp.status == 304 and headers:
+            resp.read()
+            return cache.revalidated(url)
+        if resp.status != 200:
+            msg = "{} answered HTTP {} {}"
+            raise FetchError(msg.format(url, resp.status, resp.reason))
+        if int(resp.getheader("Content-Length") or 0) > max_bytes:
+            raise _too_large(url, max_bytes)
+
+        name, tmp, f = cache.open_new(url)
+        size = 0
+        try:
+            with f:
+                while True:
+                    chunk = resp.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise _too_large(url, max_bytes)
+                    f.write(chunk)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        return cache.commit(
+            url, name, tmp,
+            resp.getheader("ETag"), resp.getheader("Last-Modified")
+        )
+    except BaseException:
+        # the rest of the body is left unread, so the connection is spent
+        connections.drop(parts)
+        raise
+
+
+async def _guarded(fetch, url, timeout):
+    # the error instead of raising it, so one URL doesn't fail the others
+    import asyncio
+
+    try:
+        return await asyncio.wait_for(fetch, timeout)
+    except asyncio.TimeoutError:
+        msg = "{} timed out after {}s"
+        return FetchError(msg.format(url, timeout))
+    except FetchError as e:
+        return e
+    except Exception as e:
+        return FetchError("{}: {}".format(url, e))
+
+
+async def _fetch_all(urls, cache, max_bytes, timeout, connections):
+    import asyncio
+    # aiohttp pools connections natively, fallback to http.client in threads
+    try:
+        import aiohttp
+    except ImportError:
+        aiohttp = None
+
+    if aiohttp is not None:
+        async with aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=connections),
+                timeout=aiohttp.ClientTimeout(total=timeout)
+                ) as session:
+            return await asyncio.gather(*[
+                _guarded(
+                    _fetch_aiohttp(session, url, cache, max_bytes),
+                    url, timeout
+                )
+                for url in urls
+            ])
+
+    loop = asyncio.get_running_loop()
+    pool = ThreadPoolExecutor(max_workers=connections)
+    local = _Connections(timeout)
+    try:
+        return await asyncio.gather(*[
+            _guarded(
+                loop.run_in_executor(
+                    pool, _fetch_http_client, local, url, cache, max_bytes
+                ),
+                url, timeout
+            )
+            for url in urls
+        ])
+    finally:
+        # a thread stuck past the timeout is left to finish on its own
+        pool.shutdown(wait=False)
+
+
+def fetch_pictures(img_paths, cache, max_bytes=MAX_BYTES, timeout=TIMEOUT,
+                   connections=CONNECTIONS):
+    """Make every picture path local, fetching http(s) URIs concurrently
+
+    Local paths are kept as they are and file:// URIs become paths. The
+    http(s) ones are fetched at once over at most connections pooled
+    connections, each within timeout seconds and max_bytes, into cache;
+    pictures already cached are only revalidated with their ETag or
+    Last-Modified, not downloaded again.
+
+    Args:
+        img_paths: paths and/or URIs of pictures
+        cache: RemoteCache to keep fetched pictures in
+
+    Returns:
+        (paths, errors), dict of every given path -> local path, and
+        dict of URI -> error message, for URIs that couldn't be fetched
+    """
+    paths, errors = {}, {}
+    urls = []
+    for img_path in dict.fromkeys(str(p) for p in img_paths):
+        scheme = urlsplit(img_path).scheme.lower()
+        if scheme == "file":
+            paths[img_path] = _file_path(img_path)
+        elif scheme not in _REMOTE_SCHEMES:
+            paths[img_path] = img_path
+        elif cache.is_fresh(img_path):
+            paths[img_path] = cache.local_path(img_path)
+        else:
+            urls.append(img_path)
+
+    if urls:
+        import asyncio
+
+        results = asyncio.run(_fetch_all(
+            urls, cache, max_bytes, timeout, min(connections, len(urls))
+        ))
+        for url, result in zip(urls, results):
+            if isinstance(result, Exception):
+                errors[url] = str(result) or type(result).__name__
+            else:
+                paths[url] = result
+        cache.save()
+    return paths, errors
+
+
+def fetch_picture(img_path, cache=None, **kwargs):
+    """Local path of one picture path or URI, see fetch_pictures
+
+    Raises:
+        FetchError: if it can't be fetched
+    """
+    if cache is None:
+        cache = RemoteCache.in_tempdir()
+    paths, errors = fetch_pictures([img_path], cache, **kwargs)
+    if errors:
+        raise FetchError(errors[str(img_path)])
+    return paths[str(img_path)]
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,133 @@
+import os.path as path
+import zipfile
+from pptx.opc.constants import CONTENT_TYPE as CT
+from pptx.opc.serialized import PackageWriter
+from pptx.parts.image import Image, ImagePart
+from pptx.util import Emu
+
+from .assets import add_picture_part, add_blob_picture, package_parts
+from . import _profile
+
+_FORMATS = {
+    "png": ("png", CT.PNG),
+    "jpeg": ("jpg", CT.JPEG),
+    "gif": ("gif", CT.GIF),
+    "bmp": ("bmp", CT.BMP),
+    "tiff": ("tiff", CT.TIFF),
+}
+# compressed already, stored as they are instead of deflated again
+_COMPRESSED = (CT.PNG, CT.JPEG, CT.GIF)
+
+
+class FileImagePart(ImagePart):
+    """Image part whose bytes stay in the source file until saved
+
+    Size and hash come from the already probed picture, so the image is
+    never loaded into memory while the presentation is being built.
+    """
+
+    def __init__(self, partname, content_type, package, file, sha1, px_size):
+        super().__init__(
+            partname=partname, content_type=content_type,
+            package=package, blob=None, filename=path.basename(file)
+        )
+        self._file = str(file)
+        self._sha1 = sha1
+        self._size = px_size
+
+    @classmethod
+    def from_picture(cls, package, picture):
+        if picture.format not in _FORMATS:
+            msg = "Can't stream image of format {}: {}"
+            raise ValueError(msg.format(picture.format, picture.path))
+
+        ext, content_type = _FORMATS[picture.format]
+        return cls(
+            package.next_image_partname(ext), content_type, package,
+            picture.path, picture.sha1, (picture.width, picture.height)
+        )
+
+    @property
+    def file(self):
+        return self._file
+
+    @property
+    def blob(self):
+        with open(self._file, "rb") as f:
+            return f.read()
+
+    @property
+    def image(self):
+        return Image(self.blob, self.desc)
+
+    @property
+    def sha1(self):
+        return self._sha1
+
+    @property
+    def _px_size(self):
+        return self._size
+
+    @property
+    def _dpi(self):
+        return 72, 72
+
+    @property
+    def _native_size(self):
+        width, height = self._size
+        return Emu(914400 * width // 72), Emu(914400 * height // 72)
+
+
+def add_file_picture(shapes, picture, left, top, width=None, height=None):
+    """Add a picture backed by its source file into given shapes
+
+    Identical pictures, by sha1, share one part within a presentation.
+    Pictures of a format not known from their header are read into
+    memory, for pptx to recognize them.
+    """
+    if picture.format not in _FORMATS:
+        with open(picture.path, "rb") as f:
+            picture = picture._replace(blob=f.read())
+        return add_blob_picture(shapes, picture, left, top, width, height)
+
+    package = shapes.part.package
+    parts = package_parts(package, "files")
+    part = parts.get(picture.sha1)
+    if part is None:
+        part = FileImagePart.from_picture(package, picture)
+        parts[picture.sha1] = part
+        _profile.count("images embedded")
+        _profile.count("bytes embedded", path.getsize(picture.path))
+    return add_picture_part(shapes, part, left, top, width, height)
+
+
+class _StreamingPackageWriter(PackageWriter):
+
+    def _write_parts(self, phys_writer):
+        for part in self._parts:
+            if isinstance(part, FileImagePart):
+                # copied over in chunks
+                if part.content_type in _COMPRESSED:
+                    compress_type = zipfile.ZIP_STORED
+                else:
+                    compress_type = zipfile.ZIP_DEFLATED
+                phys_writer._zipf.write(
+                    part.file, part.partname.membername,
+                    compress_type=compress_type
+                )
+            else:
+                phys_writer.write(part.partname, part.blob)
+            if part._rels:
+                phys_writer.write(part.partname.rels_uri, part.rels.xml)
+
+
+def save(prs, file):
+    """Save presentation, streaming file backed images into the archive"""
+    package = prs.part.package
+    _StreamingPackageWriter.write(
+        str(file), package._rels, tuple(package.iter_parts())
+    )
+
+
+if __name__ == "__main__":
+    pass
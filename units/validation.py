@@ -0,0 +1,205 @@
+import os
+import os.path as path
+import stat
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+from datetime import datetime as dt
+
+from .cover import REPORT_TITLE_LIMITS, SUBJECT_TITLE_LIMITS
+from .cover import TEXT_TITLE_LIMITS, ROLLUP_FORMATS
+
+MAX_WORKERS = 16
+
+Problem = namedtuple("Problem", ["file", "message"])
+
+
+class ValidationError(ValueError):
+    """Raised with every problem found in the inputs of a report"""
+
+    def __init__(self, problems):
+        self.problems = list(problems)
+        lines = ["{}: {}".format(p.file, p.message) for p in self.problems]
+        msg = "{} problem(s) found:\n  {}"
+        super().__init__(msg.format(len(lines), "\n  ".join(lines)))
+
+
+def _single_key(value):
+    return isinstance(value, dict) and len(value) == 1
+
+
+def check_settings(content, formats):
+    """Check content of a settings file
+
+    Args:
+        content: the parsed settings
+        formats: names of supported report formats
+
+    Returns:
+        list of str, the problems found
+    """
+    if not isinstance(content, dict):
+        return ["settings must be a mapping"]
+
+    problems = []
+    form = content.get("format")
+    if form not in formats:
+        msg = "format must be one of {}, got {!r}"
+        problems.append(msg.format(list(formats), form))
+    elif len(str(form)) > REPORT_TITLE_LIMITS:
+        msg = "format can have at most {} characters"
+        problems.append(msg.format(REPORT_TITLE_LIMITS))
+
+    date = content.get("date")
+    if date:
+        msg = "date must be YYYY-MM-DD, got {!r}"
+        if isinstance(date, dt) or not isinstance(date, (str, datetime.date)):
+            # unquoted dates are parsed by yaml, but only plain days pass
+            problems.append(msg.format(date))
+        elif isinstance(date, str):
+            try:
+                dt.strptime(date, "%Y-%m-%d")
+            except ValueError:
+                problems.append(msg.format(date))
+
+    if form in ROLLUP_FORMATS:
+        if not date:
+            problems.append("date must be given, to pick the weeks")
+        sources = content.get("sources")
+        if isinstance(sources, str):
+            sources = [sources]
+        if not isinstance(sources, list) or not sources:
+            problems.append(
+                "sources must list the weekly settings, as files, "
+                "directories or glob patterns"
+            )
+        return problems
+
+    subjects = content.get("subjects")
+    if not isinstance(subjects, list) or not subjects:
+        problems.append("subjects must be a non-empty list of files")
+    return problems
+
+
+def _check_picture(picture, where):
+    if not isinstance(picture, dict):
+        return ["{}: picture must be a mapping".format(where)]
+
+    problems = []
+    for key in ("name", "path", "description"):
+        if key not in picture:
+            problems.append("{}: picture has no {}".format(where, key))
+    return problems
+
+
+def check_subject(content, section_limit=TEXT_TITLE_LIMITS):
+    """Check content of a subject file
+
+    Args:
+        content: the parsed subject
+        section_limit: characters a section name can have at most
+
+    Returns:
+        (problems, pictures), list of str and list of the picture paths
+    """
+    if not isinstance(content, dict):
+        return ["subject must be a mapping"], []
+
+    problems = []
+    for key in ("title", "info", "sections"):
+        if key not in content:
+            problems.append("subject has no {}".format(key))
+
+    title = content.get("title")
+    if title is not None and len(str(title)) > SUBJECT_TITLE_LIMITS:
+        msg = "title can have at most {} characters, got {}"
+        problems.append(msg.format(SUBJECT_TITLE_LIMITS, len(str(title))))
+
+    sections = content.get("sections")
+    if sections is None:
+        return problems, []
+    if not isinstance(sections, list):
+        return problems + ["sections must be a list"], []
+
+    pictures = []
+    for num, section in enumerate(sections, 1):
+        if not _single_key(section):
+            msg = "section #{} must be a mapping of name to items"
+            problems.append(msg.format(num))
+            continue
+
+        name, items = next(iter(section.items()))
+        where = "section {!r}".format(name)
+        if len(str(name)) > section_limit:
+            msg = "{}: name can have at most {} characters, got {}"
+            problems.append(msg.format(where, section_limit, len(str(name))))
+        if not isinstance(items, list) or not items:
+            problems.append("{}: must have a list of items".format(where))
+            continue
+
+        kinds = set()
+        for item in items:
+            if not _single_key(item):
+                problems.append("{}: items must be text or picture".format(
+                    where
+                ))
+                continue
+            kind, value = next(iter(item.items()))
+            kinds.add(kind)
+            if kind == "picture":
+                found = _check_picture(value, where)
+                problems.extend(found)
+                if not found:
+                    pictures.append(str(value["path"]))
+            elif kind != "text":
+                msg = "{}: unknown item {!r}, must be text or picture"
+                problems.append(msg.format(where, kind))
+
+        if "text" not in kinds and "picture" not in kinds:
+            problems.append("{}: must have text and/or picture".format(
+                where
+            ))
+    return problems, pictures
+
+
+def _stat_picture(pic):
+    try:
+        info = os.stat(pic)
+    except FileNotFoundError:
+        return "no such picture"
+    except OSError as e:
+        return "can't access picture: {}".format(e.strerror)
+
+    if not stat.S_ISREG(info.st_mode):
+        return "picture is not a file"
+    if info.st_size == 0:
+        return "picture is empty"
+    if not os.access(pic, os.R_OK):
+        return "picture is not readable"
+    return None
+
+
+def check_pictures(pictures, workers=None):
+    """Stat pictures concurrently, slow network mounts stat in parallel
+
+    Args:
+        pictures: paths of the pictures
+
+    Returns:
+        dict of path -> problem, for the pictures that aren't usable
+    """
+    pictures = list(dict.fromkeys(path.abspath(str(p)) for p in pictures))
+    if not pictures:
+        return {}
+
+    if workers is None:
+        workers = min(MAX_WORKERS, (os.cpu_count() or 1) * 4)
+    workers = max(1, min(workers, len(pictures)))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        found = dict(zip(pictures, pool.map(_stat_picture, pictures)))
+    return {pic: problem for pic, problem in found.items() if problem}
+
+
+if __name__ == "__main__":
+    pass